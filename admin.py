@@ -0,0 +1,38 @@
+import pandas as pd
+import streamlit as st
+
+import profiling
+from corpus import text_cache_stats
+from db import pool_metrics
+
+
+def is_admin(email):
+    admins = {e.strip().lower() for e in st.secrets.get("ADMIN_EMAILS", [])}
+    return bool(email) and email in admins
+
+
+def render_debug_panel():
+    """Recent rerun timings, slowest sessions and cache/pool state for this process."""
+    with st.sidebar.expander("🛠 Performance"):
+        if not profiling.ENABLED:
+            st.caption("Start the app with EVIBENCH_PROFILE=1 to record reruns.")
+        else:
+            records = list(profiling.recent)
+            if records:
+                df = pd.DataFrame([{
+                    "page": r["page"],
+                    "user": r["user"],
+                    "total_ms": r["total_ms"],
+                    "round_trips": r["round_trips"],
+                    **{f"{k}_ms": v for k, v in r["phases_ms"].items()},
+                } for r in records])
+                st.markdown("**Reruns (ms)**")
+                st.dataframe(df.describe(percentiles=[0.5, 0.95]).T[["count", "50%", "95%", "max"]])
+                st.markdown("**Slowest sessions**")
+                st.dataframe(pd.DataFrame(profiling.worst_sessions()))
+            else:
+                st.caption("No reruns recorded yet.")
+        st.markdown("**Connection pool**")
+        st.json(pool_metrics())
+        st.markdown("**Question text cache**")
+        st.json(text_cache_stats())
@@ -0,0 +1,242 @@
+import argparse
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+N_BOOT = 2000
+# Bootstrap replicates are drawn in batches of about this many pattern weights
+BOOT_BATCH_CELLS = 1_000_000
+CI_LEVEL = 0.95
+# Annotator pairs sharing fewer items get no Cohen's kappa
+MIN_PAIR_ITEMS = 20
+
+# measure: (categories from low to high, metric, unit that is rated)
+MEASURES = {
+    "accuracy": (["Low Accuracy", "Moderate", "High"], "ordinal", "answer"),
+    "comprehension": ([1, 2, 3, 4, 5], "interval", "answer"),
+    "novelty": (["No", "Maybe", "Yes"], "nominal", "answer"),
+    "analysis_category": (["Bad", "Average", "Good"], "ordinal", "answer"),
+    "reference_rating": (["Bad", "Average", "Good"], "ordinal", "answer"),
+    "preferred_reference": ([1, 2, 3, 4], "nominal", "question"),
+}
+
+
+def rating_matrix(df, measure):
+    """Items x raters category codes of one measure, -1 where an item is unrated.
+
+    df holds flattened responses as written by export_responses.py. Returns
+    (matrix, items, raters) where items has the qid (and answer) of each row.
+    """
+    categories, _, unit = MEASURES[measure]
+    keys = ["qid", "answer"] if unit == "answer" else ["qid"]
+    if unit == "question":
+        # repeated on every answer row of a response
+        df = df[df["answer"] == 1]
+    codes = pd.Categorical(df[measure], categories=categories).codes
+    rated = df.loc[codes >= 0, keys + ["email"]]
+    codes = codes[codes >= 0]
+
+    item_ids = rated.groupby(keys, sort=True).ngroup().to_numpy()
+    items = rated[keys].drop_duplicates().sort_values(keys).reset_index(drop=True)
+    rater_ids, raters = pd.factorize(rated["email"], sort=True)
+    matrix = np.full((len(items), len(raters)), -1, dtype=np.int8)
+    matrix[item_ids, rater_ids] = codes
+    return matrix, items, np.asarray(raters)
+
+
+def category_counts(matrix, n_categories):
+    """Items x categories number of raters choosing each category."""
+    return (matrix[:, :, None] == np.arange(n_categories)).sum(axis=1)
+
+
+def _distance(n_c, metric):
+    """Squared distance between categories; ordinal depends on the marginals n_c (B x C)."""
+    c = np.arange(n_c.shape[1])
+    if metric == "nominal":
+        return (c[:, None] != c[None, :]).astype(float)
+    if metric == "interval":
+        return ((c[:, None] - c[None, :]) ** 2).astype(float)
+    lo, hi = np.minimum.outer(c, c), np.maximum.outer(c, c)
+    cum = np.cumsum(n_c, axis=1)
+    between = cum[:, hi] - cum[:, lo] + n_c[:, lo]
+    return (between - (n_c[:, :, None] + n_c[:, None, :]) / 2) ** 2
+
+
+# The statistics below take weights W (B x rows), one row per bootstrap
+# replicate, and return B values. Rows are distinct rating patterns and W
+# says how many items show each one.
+
+def krippendorff_alpha(counts, W, metric="nominal"):
+    """Krippendorff's alpha from items x categories counts; items need 2+ ratings."""
+    n_items, n_cat = counts.shape
+    Wm = W / (counts.sum(axis=1) - 1)
+    pairs = (counts[:, :, None] * counts[:, None, :]).reshape(n_items, -1)
+    coincidence = (Wm @ pairs).reshape(-1, n_cat, n_cat)
+    diag = np.arange(n_cat)
+    coincidence[:, diag, diag] -= Wm @ counts
+    n_c = coincidence.sum(axis=2)
+    n = n_c.sum(axis=1)
+    delta = _distance(n_c, metric)
+    observed = (coincidence * delta).sum(axis=(1, 2))
+    expected = (n_c[:, :, None] * n_c[:, None, :] * delta).sum(axis=(1, 2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 1 - (n - 1) * observed / expected
+
+
+def fleiss_kappa(counts, W):
+    """Fleiss' kappa from items x categories counts; every item has the same number of ratings."""
+    m = counts[0].sum()
+    p_item = ((counts ** 2).sum(axis=1) - m) / (m * (m - 1))
+    total = W.sum(axis=1)
+    p_bar = W @ p_item / total
+    p_cat = (W @ counts) / (total * m)[:, None]
+    p_e = (p_cat ** 2).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (p_bar - p_e) / (1 - p_e)
+
+
+def cohen_kappa(pairs, W, n_categories, metric="nominal"):
+    """Cohen's kappa, quadratic-weighted unless nominal, from items x C*C one-hot rating pairs."""
+    confusion = (W @ pairs).reshape(-1, n_categories, n_categories)
+    confusion /= confusion.sum(axis=(1, 2))[:, None, None]
+    expected = confusion.sum(axis=2)[:, :, None] * confusion.sum(axis=1)[:, None, :]
+    delta = _distance(np.ones((1, n_categories)), "nominal" if metric == "nominal" else "interval")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 1 - (confusion * delta).sum(axis=(1, 2)) / (expected * delta).sum(axis=(1, 2))
+
+
+def collapse(data):
+    """Distinct rows of data and how many items share each."""
+    patterns, freq = np.unique(data, axis=0, return_counts=True)
+    return patterns, freq
+
+
+def _bootstrap_batch(stat, patterns, freq, n_boot, seed):
+    """stat on n_boot resamples of the items behind patterns."""
+    rng = np.random.default_rng(seed)
+    # drawing n items with replacement only changes how often each pattern occurs
+    W = rng.multinomial(freq.sum(), freq / freq.sum(), size=n_boot)
+    return stat(patterns, W.astype(float))
+
+
+def bootstrap_ci(stat, patterns, freq, n_boot=N_BOOT, pool=None, seed=0, level=CI_LEVEL):
+    """Percentile interval of stat over item resamples, computed in batches."""
+    batch = max(1, min(n_boot, BOOT_BATCH_CELLS // len(patterns)))
+    sizes = [min(batch, n_boot - start) for start in range(0, n_boot, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    run = pool.map if pool is not None else map
+    k = len(sizes)
+    samples = np.concatenate(list(run(_bootstrap_batch, [stat] * k, [patterns] * k, [freq] * k, sizes, seeds)))
+    samples = samples[np.isfinite(samples)]
+    if not len(samples):
+        return np.nan, np.nan
+    low, high = np.quantile(samples, [(1 - level) / 2, (1 + level) / 2])
+    return low, high
+
+
+def item_disagreement(matrix, counts, metric):
+    """Share of disagreeing rating pairs per item, plus the code range unless nominal."""
+    m = counts.sum(axis=1)
+    agreeing = (counts * (counts - 1)).sum(axis=1)
+    result = {"n_raters": m, "disagreement": 1 - agreeing / (m * (m - 1))}
+    if metric != "nominal":
+        rated = np.where(matrix >= 0, matrix, np.nan)
+        result["spread"] = np.nanmax(rated, axis=1) - np.nanmin(rated, axis=1)
+    return result
+
+
+def _estimate(stat, data, n_boot, pool, seed):
+    patterns, freq = collapse(data)
+    value = stat(patterns, freq[None, :].astype(float))[0]
+    low, high = bootstrap_ci(stat, patterns, freq, n_boot, pool, seed) if n_boot else (np.nan, np.nan)
+    return value, low, high
+
+
+def analyze_measure(df, measure, n_boot=N_BOOT, pool=None, seed=0):
+    """Summary row, per-pair Cohen's kappa rows and per-item disagreement of one measure."""
+    categories, metric, _ = MEASURES[measure]
+    n_cat = len(categories)
+    matrix, items, raters = rating_matrix(df, measure)
+    counts = category_counts(matrix, n_cat)
+    multi = counts.sum(axis=1) >= 2
+    counts, matrix, items = counts[multi], matrix[multi], items[multi].reset_index(drop=True)
+
+    summary = {"measure": measure, "metric": metric, "items": len(counts), "raters": len(raters)}
+    if len(counts):
+        alpha = functools.partial(krippendorff_alpha, metric=metric)
+        summary["alpha"], summary["alpha_low"], summary["alpha_high"] = _estimate(alpha, counts, n_boot, pool, seed)
+        # Fleiss' kappa needs a fixed number of raters; use the most common one
+        m = counts.sum(axis=1)
+        modal = np.bincount(m).argmax()
+        summary["fleiss_items"] = int((m == modal).sum())
+        summary["fleiss_kappa"], summary["fleiss_low"], summary["fleiss_high"] = _estimate(
+            fleiss_kappa, counts[m == modal], n_boot, pool, seed
+        )
+
+    pair_rows = []
+    rated = (matrix >= 0).astype(np.int32)
+    shared = rated.T @ rated
+    for a, b in zip(*np.nonzero(np.triu(shared >= MIN_PAIR_ITEMS, k=1))):
+        both = (matrix[:, a] >= 0) & (matrix[:, b] >= 0)
+        pair_codes = matrix[both, a].astype(int) * n_cat + matrix[both, b]
+        pairs = np.eye(n_cat * n_cat)[pair_codes]
+        kappa = functools.partial(cohen_kappa, n_categories=n_cat, metric=metric)
+        value, low, high = _estimate(kappa, pairs, n_boot, pool, seed)
+        pair_rows.append({
+            "measure": measure, "rater_a": raters[a], "rater_b": raters[b],
+            "items": int(both.sum()), "kappa": value, "kappa_low": low, "kappa_high": high,
+        })
+
+    # question-level measures get an empty answer column
+    per_item = items.reindex(columns=["qid", "answer"]).assign(
+        measure=measure, **item_disagreement(matrix, counts, metric)
+    )
+    return summary, pair_rows, per_item
+
+
+def analyze(df, measures=None, n_boot=N_BOOT, workers=None, seed=0):
+    """Agreement of every measure: (summary, per-pair Cohen's kappa, per-item disagreement)."""
+    summaries, pair_rows, per_item = [], [], []
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 0 else None
+    try:
+        for measure in measures or MEASURES:
+            summary, pairs, items = analyze_measure(df, measure, n_boot, pool, seed)
+            summaries.append(summary)
+            pair_rows.extend(pairs)
+            per_item.append(items)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    per_item = pd.concat(per_item, ignore_index=True).astype({"answer": "Int8"})
+    return pd.DataFrame(summaries), pd.DataFrame(pair_rows), per_item
+
+
+def read_responses(path):
+    columns = ["email", "qid", "answer"] + list(MEASURES)
+    if path.endswith(".csv"):
+        return pd.read_csv(path, usecols=columns)
+    return pd.read_parquet(path, columns=columns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inter-annotator agreement on exported responses.")
+    parser.add_argument("path", nargs="?", default="responses.parquet", help="output of export_responses.py")
+    parser.add_argument("--measure", action="append", choices=list(MEASURES), help="repeat to pick several")
+    parser.add_argument("--boot", type=int, default=N_BOOT, help="bootstrap replicates; 0 skips the CIs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="0 runs the bootstrap in-process")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--items-out", help="write per-item disagreement to this CSV")
+    args = parser.parse_args()
+
+    summary, pairs, per_item = analyze(read_responses(args.path), args.measure, args.boot, args.workers, args.seed)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(summary.round(3).to_string(index=False))
+        if len(pairs):
+            print()
+            print(pairs.round(3).to_string(index=False))
+    if args.items_out:
+        per_item.to_csv(args.items_out, index=False)
+        print(f"Per-item disagreement written to {args.items_out}")
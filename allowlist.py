@@ -0,0 +1,22 @@
+import datetime
+
+from corpus import load_user_index
+from db import get_users
+
+
+def is_approved(email):
+    """Whether email has questions assigned at the current corpus revision.
+
+    Reads the same user index as the annotation page, so a login is only
+    approved while it has questions to show.
+    """
+    return bool(load_user_index().get(email))
+
+
+def register_user(email):
+    """Save user info on first login with a single upsert."""
+    get_users().update_one(
+        {"email": email},
+        {"$setOnInsert": {"created_at": datetime.datetime.utcnow()}},
+        upsert=True,
+    )
@@ -0,0 +1,323 @@
+"""Headless load test: concurrent annotator journeys against a synthetic corpus.
+
+    python benchmarks/run.py --sizes 1000 10000 100000 --sessions 10
+
+Each session runs in its own forked process, like one Streamlit worker
+per annotator: AppTest swaps process-wide globals (st.secrets, the runtime)
+and cannot run concurrently in threads. With the default mongomock backend
+every process works on a copy of the seeded corpus; pass --mongo-uri to
+share one real server (use a throwaway database; it is dropped before each
+size). Results are appended to benchmarks/results.jsonl with the current
+commit so runs can be compared.
+
+The mongomock backend needs the extra packages in benchmarks/requirements.txt:
+
+    pip install -r benchmarks/requirements.txt
+"""
+import argparse
+import collections
+import datetime
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import corpus  # noqa: E402
+import db  # noqa: E402
+from benchmarks.synthetic import annotator_email, seed_database  # noqa: E402
+
+RESULTS_PATH = os.path.join(REPO_ROOT, "benchmarks", "results.jsonl")
+APP_PATH = os.path.join(REPO_ROOT, "app.py")
+ANNOTATION_PATH = os.path.join(REPO_ROOT, "pages", "annotation.py")
+RUN_TIMEOUT_SEC = 60
+
+
+class OpCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = collections.Counter()
+
+    def add(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def total(self):
+        with self._lock:
+            return sum(self.counts.values())
+
+
+class CountingCollection:
+    """Forwards to a real collection, counting each operation as one round-trip."""
+
+    OPS = {
+        "find", "find_one", "aggregate", "distinct", "count_documents", "insert_one",
+        "insert_many", "update_one", "update_many", "replace_one", "bulk_write",
+        "delete_one", "delete_many", "find_one_and_update", "create_index",
+    }
+
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in self.OPS:
+            def counted(*args, **kwargs):
+                self._counter.add(f"{self._collection.name}.{name}")
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+class CountingDatabase:
+    def __init__(self, database, counter):
+        self._database = database
+        self._counter = counter
+
+    def __getitem__(self, name):
+        return CountingCollection(self._database[name], self._counter)
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
+
+
+class CountingClient:
+    def __init__(self, client, counter):
+        self._client = client
+        self._counter = counter
+
+    def __getitem__(self, name):
+        return CountingDatabase(self._client[name], self._counter)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def make_client(mongo_uri):
+    if mongo_uri:
+        from pymongo import MongoClient
+        return MongoClient(mongo_uri)
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit(
+            "mongomock is not installed: pip install -r benchmarks/requirements.txt, or pass --mongo-uri"
+        )
+    return mongomock.MongoClient()
+
+
+def timed_run(app, timings):
+    start = time.perf_counter()
+    app.run(timeout=RUN_TIMEOUT_SEC)
+    timings.append(time.perf_counter() - start)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return app
+
+
+def click(app, label, timings):
+    button = next(b for b in app.button if b.label == label)
+    button.click()
+    return timed_run(app, timings)
+
+
+def rate_question(app, qid, timings, submit_label):
+    """Rate four answers, the references and the best answers, then submit."""
+    for i in range(1, 5):
+        app.radio(key=f"accuracy_{qid}_{i}").set_value("High")
+        app.radio(key=f"novel_{qid}_{i}").set_value("No")
+        app.radio(key=f"analysis_cat_{qid}_{i}").set_value("Good")
+        timed_run(app, timings)
+        click(app, "Next", timings)
+    for i in range(1, 5):
+        app.radio(key=f"ref_rating_{qid}_{i}").set_value("Good")
+    app.radio(key=f"preferred_{qid}").set_value("Reference 1")
+    timed_run(app, timings)
+    click(app, "Next", timings)
+    app.multiselect(key=f"best_answers_{qid}").set_value(["Answer 1"])
+    timed_run(app, timings)
+    click(app, submit_label, timings)
+
+
+def journey(email, timings):
+    """Login, annotate one question, then reopen and edit it."""
+    app = AppTest.from_file(APP_PATH, default_timeout=RUN_TIMEOUT_SEC)
+    # the client is patched in bench_size; these only satisfy secret lookups
+    app.secrets["MONGO_URI"] = "mongodb://benchmark"
+    app.secrets["ADMIN_EMAILS"] = []
+    timed_run(app, timings)
+    app.text_input[0].input(email)
+    click(app, "Enter", timings)
+    if not app.session_state["logged_in"]:
+        raise RuntimeError(f"login failed for {email}")
+
+    app.switch_page("pages/annotation.py")
+    timed_run(app, timings)
+    qid = app.session_state["current_qid"]
+    rate_question(app, qid, timings, "Submit")
+
+    # the navigator moved on to the next question; pick this one again
+    app.radio(key="nav_filter").set_value("Done")
+    timed_run(app, timings)
+    app.radio(key=f"nav_pick_{app.session_state['current_qid']}").set_value(qid)
+    timed_run(app, timings)
+    rate_question(app, qid, timings, "Save Edit")
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def reset_caches():
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    corpus.fetch_question.cache_clear()
+
+
+# Set in the parent before forking so every session process inherits them
+_seeded_client = None
+_mongo_uri = None
+
+
+def run_session(i):
+    """One annotator's journey in a fresh worker process."""
+    counter = OpCounter()
+    # pymongo clients must not cross a fork; mongomock data can
+    raw_client = make_client(_mongo_uri) if _mongo_uri else _seeded_client
+    client = CountingClient(raw_client, counter)
+    metrics = db.PoolMetrics()
+    db.get_client = lambda: (client, metrics)
+    reset_caches()
+
+    # first render in a new worker pays for the metadata load
+    start = time.perf_counter()
+    corpus.load_user_index()
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    ops_before = counter.total()
+    timings = []
+    error = None
+    try:
+        journey(annotator_email(i), timings)
+    except Exception as e:  # keep going; report failed journeys
+        error = str(e)
+    return {
+        "timings": timings,
+        "ops": counter.total() - ops_before,
+        "op_counts": dict(counter.counts),
+        "cold_ms": cold_ms,
+        "error": error,
+        # ru_maxrss is in KB on Linux
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def bench_size(size, sessions, mongo_uri, text_chars):
+    global _seeded_client, _mongo_uri
+    raw_client = make_client(mongo_uri)
+    raw_client.drop_database("database")
+    seed_database(raw_client["database"], size, n_annotators=max(sessions, 1), text_chars=text_chars)
+    _seeded_client = None if mongo_uri else raw_client
+    _mongo_uri = mongo_uri
+    if mongo_uri:
+        raw_client.close()
+
+    start = time.perf_counter()
+    with multiprocessing.get_context("fork").Pool(sessions) as pool:
+        results = pool.map(run_session, range(sessions))
+    wall = time.perf_counter() - start
+
+    timings = [t for r in results for t in r["timings"]]
+    reruns = len(timings)
+    errors = [r["error"] for r in results if r["error"]]
+    op_counts = collections.Counter()
+    for r in results:
+        op_counts.update(r["op_counts"])
+    return {
+        "size": size,
+        "sessions": sessions,
+        "reruns": reruns,
+        "failed_journeys": len(errors),
+        "errors": errors[:5],
+        "cold_load_ms": round(statistics.median(r["cold_ms"] for r in results), 1),
+        "p50_ms": round(percentile(timings, 50) * 1000, 1) if timings else None,
+        "p95_ms": round(percentile(timings, 95) * 1000, 1) if timings else None,
+        "mean_ms": round(statistics.mean(timings) * 1000, 1) if timings else None,
+        "ops_per_rerun": round(sum(r["ops"] for r in results) / reruns, 2) if reruns else None,
+        "top_ops": dict(op_counts.most_common(8)),
+        "wall_sec": round(wall, 1),
+        "peak_rss_mb": round(max(r["rss_mb"] for r in results), 1),
+    }
+
+
+def previous_results():
+    latest = {}
+    if os.path.exists(RESULTS_PATH):
+        with open(RESULTS_PATH) as f:
+            for line in f:
+                record = json.loads(line)
+                latest[(record["size"], record["sessions"])] = record
+    return latest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--text-chars", type=int, default=500, help="characters per synthetic answer")
+    parser.add_argument("--mongo-uri", help="benchmark a real mongod instead of mongomock")
+    parser.add_argument("--no-save", action="store_true", help="do not append to results.jsonl")
+    args = parser.parse_args()
+
+    baseline = previous_results()
+    commit = git_commit()
+    # spool, snapshot and log files go to a scratch directory
+    os.chdir(tempfile.mkdtemp(prefix="evibench-bench-"))
+
+    for size in args.sizes:
+        result = bench_size(size, args.sessions, args.mongo_uri, args.text_chars)
+        result.update({
+            "commit": commit,
+            "backend": "mongod" if args.mongo_uri else "mongomock",
+            "at": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+        })
+        line = (
+            f"size={size:>7} sessions={args.sessions} reruns={result['reruns']} "
+            f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+            f"ops/rerun={result['ops_per_rerun']} rss={result['peak_rss_mb']}MB"
+        )
+        before = baseline.get((size, args.sessions))
+        if before and before.get("p95_ms") and result["p95_ms"]:
+            line += f" (p95 {result['p95_ms'] / before['p95_ms'] - 1:+.0%} vs {before['commit']})"
+        print(line)
+        for error in result["errors"]:
+            print(f"  journey failed: {error}")
+        if not args.no_save:
+            with open(RESULTS_PATH, "a") as f:
+                f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import random
+
+WORDS = (
+    "melanoma tumor cell signaling pathway expression immune response receptor "
+    "ligand chemokine cytokine mutation subtype resistance therapy evidence "
+    "analysis transcriptional program microenvironment schwann precursor"
+).split()
+TOPICS = ["Melanoma", "TME", "Immunology", "Genomics", "Oncology"]
+
+
+def _text(rng, chars):
+    words = []
+    size = 0
+    while size < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def _reference(rng, chars):
+    return _text(rng, chars) + f" https://doi.org/10.{rng.randint(1000, 9999)}/{rng.randint(10**5, 10**6)}"
+
+
+def annotator_email(i):
+    return f"annotator{i}@example.org"
+
+
+def generate_corpus(n_questions, n_annotators=40, text_chars=500, seed=0):
+    """Synthetic evibench documents with the same fields as the real corpus."""
+    rng = random.Random(seed)
+    for qid in range(1, n_questions + 1):
+        doc = {
+            "QID": qid,
+            "Qtopic": rng.choice(TOPICS),
+            "Question": _text(rng, text_chars // 2),
+            "Annotator": f"annotator{qid % n_annotators}",
+            "Email": annotator_email(qid % n_annotators),
+            "_rev": 1,
+        }
+        for i in range(1, 5):
+            doc[f"Answer{i}"] = _text(rng, text_chars)
+            doc[f"Reference{i}"] = _reference(rng, text_chars // 2)
+        yield doc
+
+
+def seed_database(db, n_questions, n_annotators=40, text_chars=500, batch_size=5000):
+    """Load a synthetic corpus into db and publish it as revision 1."""
+    evibench = db["evibench"]
+    batch = []
+    for doc in generate_corpus(n_questions, n_annotators, text_chars):
+        batch.append(doc)
+        if len(batch) == batch_size:
+            evibench.insert_many(batch)
+            batch = []
+    if batch:
+        evibench.insert_many(batch)
+    evibench.create_index("QID")
+    evibench.create_index("Email")
+    db["meta"].update_one(
+        {"_id": "evibench"},
+        {"$set": {"revision": 1, "published_revision": 1, "encoding_normalized": True}},
+        upsert=True,
+    )
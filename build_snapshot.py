@@ -0,0 +1,30 @@
+import argparse
+import time
+
+from pymongo.errors import PyMongoError
+
+from corpus import REVISION_CHECK_SEC, current_revision, refresh_snapshot
+from snapshot import SNAPSHOT_PATH
+
+# Write or update the local evibench snapshot and shared corpus file, e.g. as
+# a deploy step. With --watch it keeps publishing each new revision; run one
+# watcher per host so the app workers only remap the files.
+parser = argparse.ArgumentParser(description="Publish the local evibench snapshot.")
+parser.add_argument("--watch", action="store_true", help="keep running and publish every new revision")
+parser.add_argument("--interval", type=float, default=REVISION_CHECK_SEC, help="seconds between revision checks")
+args = parser.parse_args()
+
+revision = None
+while True:
+    try:
+        if revision != current_revision():
+            start = time.perf_counter()
+            revision = refresh_snapshot()
+            print(f"Snapshot {SNAPSHOT_PATH} at revision {revision} ({time.perf_counter() - start:.1f}s)", flush=True)
+    except PyMongoError as e:
+        if not args.watch:
+            raise
+        print(f"Revision check failed, retrying: {e}", flush=True)
+    if not args.watch:
+        break
+    time.sleep(args.interval)
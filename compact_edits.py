@@ -0,0 +1,23 @@
+from db import EDITS, RESPONSES, get_db
+from edit_history import compact
+
+db = get_db()
+responses_collection = db[RESPONSES]
+edits_collection = db[EDITS]
+
+
+def collection_size():
+    return db.command("collStats", EDITS).get("size", 0)
+
+
+# Rewrite every question's edit log as patches with periodic snapshots
+size_before = collection_size()
+questions = rewritten = 0
+for group in edits_collection.aggregate([{"$group": {"_id": {"email": "$email", "qid": "$qid"}}}]):
+    key = group["_id"]
+    rewritten += compact(responses_collection, edits_collection, key["email"], key["qid"])
+    questions += 1
+size_after = collection_size()
+
+print(f"Done. Questions: {questions}, edits rewritten: {rewritten}")
+print(f"Edit log size: {size_before / 1024:.1f} KB -> {size_after / 1024:.1f} KB")
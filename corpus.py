@@ -0,0 +1,352 @@
+import contextlib
+import datetime
+import functools
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from db import get_evibench, get_meta
+from snapshot import (
+    SNAPSHOT_PATH,
+    SharedCorpus,
+    corpus_revision,
+    read_snapshot,
+    snapshot_revision,
+    write_corpus,
+    write_snapshot,
+)
+
+# Small per-question fields kept in memory for every question; _rev is the
+# corpus revision that last changed the document. A double-annotated QID has
+# one document per annotator, so _id identifies a row.
+META_FIELDS = ["_id", "QID", "Qtopic", "Email", "_rev"]
+# Large fields fetched only for the question being displayed
+TEXT_FIELDS = ["Qtopic", "Question"] + [
+    f"{kind}{i}" for i in range(1, 5) for kind in ("Answer", "Reference")
+]
+# How many questions' text each process keeps around
+TEXT_CACHE_SIZE = 256
+# Low-cardinality columns repeated on every row
+CATEGORY_FIELDS = ["Email", "Annotator", "Qtopic"]
+# A Latin-1 lead byte followed by a continuation byte: UTF-8 read as Latin-1
+MOJIBAKE_PATTERN = "[\u00c2-\u00f4][\u0080-\u00bf]"
+# Document in the meta collection describing the evibench collection
+CORPUS_STATE_ID = "evibench"
+# How often a process checks whether the corpus revision moved
+REVISION_CHECK_SEC = 10
+# A writer that died without releasing its lease blocks others this long
+WRITE_LEASE_SEC = 3600
+
+
+class CorpusBusyError(Exception):
+    pass
+
+
+def fix_encoding(val):
+    """Fix mojibake: UTF-8 bytes that were decoded as Latin-1."""
+    if isinstance(val, str):
+        try:
+            return val.encode("latin-1").decode("utf-8")
+        except (UnicodeDecodeError, UnicodeEncodeError):
+            return val
+    return val
+
+
+def repair_encoding(df):
+    """Fix mojibake column by column, only in cells that look broken.
+
+    Returns the repaired frame and a boolean frame marking changed cells.
+    """
+    df = df.copy()
+    changed = pd.DataFrame(False, index=df.index, columns=df.columns)
+    for col in df.columns:
+        if not pd.api.types.is_string_dtype(df[col].dtype):
+            continue
+        suspect = df[col].str.contains(MOJIBAKE_PATTERN, regex=True, na=False)
+        if not suspect.any():
+            continue
+        original = df.loc[suspect, col]
+        repaired = original.map(fix_encoding)
+        diff = repaired != original
+        df.loc[diff[diff].index, col] = repaired[diff]
+        changed.loc[diff[diff].index, col] = True
+    return df, changed
+
+
+@st.cache_resource(ttl=60)
+def encoding_normalized():
+    """Whether the evibench collection was repaired by migrate_encoding.py."""
+    state = get_meta().find_one({"_id": CORPUS_STATE_ID}) or {}
+    return bool(state.get("encoding_normalized"))
+
+
+def drop_empty_columns(df):
+    """Drop columns with no values, e.g. the unnamed trailing CSV columns."""
+    if df.empty:
+        # nothing to judge by; keep the schema
+        return df
+    blank = df.isna() | df.apply(lambda col: col.astype(str).str.strip() == "")
+    return df.loc[:, ~blank.all()]
+
+
+def normalize_evibench(df):
+    """Compact evibench frame: no empty columns, int32 QID, categorical and Arrow strings."""
+    df = drop_empty_columns(df)
+    if "QID" in df.columns:
+        df = df.dropna(subset=["QID"])
+        df = df.astype({"QID": "int32"})
+        # same order however the frame was assembled, so every worker walks
+        # a user's questions identically
+        df = df.sort_values([c for c in ("QID", "_id") if c in df.columns], kind="stable")
+    dtypes = {}
+    for col in df.columns:
+        if col in CATEGORY_FIELDS:
+            dtypes[col] = "category"
+        elif pd.api.types.is_string_dtype(df[col].dtype):
+            dtypes[col] = "string[pyarrow]"
+    return df.astype(dtypes).reset_index(drop=True)
+
+
+def memory_report(before, after):
+    """Deep memory use per column, in bytes, of two versions of a frame."""
+    report = pd.DataFrame({
+        "before": before.memory_usage(deep=True, index=False),
+        "after": after.memory_usage(deep=True, index=False),
+    })
+    report.loc["total"] = report.sum()
+    return report
+
+
+@contextlib.contextmanager
+def corpus_writer(name):
+    """Hold the corpus write lease while a script writes and publishes a revision.
+
+    Published revisions only move up ($max), so a revision published while
+    a lower one is still being written would hide that writer's documents.
+    Scripts that write evibench therefore run one at a time.
+    """
+    token = str(ObjectId())
+    now = datetime.datetime.utcnow()
+    try:
+        # matches only when the lease is free; otherwise the upsert collides on _id
+        get_meta().update_one(
+            {"_id": CORPUS_STATE_ID, "$or": [
+                {"writer": {"$exists": False}},
+                {"writer_until": {"$lt": now}},
+            ]},
+            {"$set": {
+                "writer": token,
+                "writer_name": name,
+                "writer_until": now + datetime.timedelta(seconds=WRITE_LEASE_SEC),
+            }},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        state = get_meta().find_one({"_id": CORPUS_STATE_ID}) or {}
+        raise CorpusBusyError(
+            f"{state.get('writer_name')} is writing the corpus (lease until {state.get('writer_until')} UTC)"
+        )
+    try:
+        yield
+    finally:
+        get_meta().update_one(
+            {"_id": CORPUS_STATE_ID, "writer": token},
+            {"$unset": {"writer": "", "writer_name": "", "writer_until": ""}},
+        )
+
+
+def begin_revision():
+    """Reserve a new corpus revision for documents about to be written."""
+    state = get_meta().find_one_and_update(
+        {"_id": CORPUS_STATE_ID},
+        {"$inc": {"revision": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return state["revision"]
+
+
+def publish_revision(revision):
+    """Tell readers every document stamped with revision has been written."""
+    get_meta().update_one(
+        {"_id": CORPUS_STATE_ID},
+        {"$max": {"published_revision": revision}},
+        upsert=True,
+    )
+
+
+def current_revision():
+    state = get_meta().find_one({"_id": CORPUS_STATE_ID}, {"published_revision": 1}) or {}
+    return state.get("published_revision", 0)
+
+
+def fetch_evibench(query, fields=None):
+    """Normalized evibench documents matching query, all fields unless given."""
+    projection = {field: 1 for field in fields or []} or None
+    df = pd.DataFrame(list(get_evibench().find(query, projection)), columns=fields)
+    if "_id" in df.columns:
+        df["_id"] = df["_id"].astype(str)
+    df["_rev"] = df["_rev"].fillna(0) if "_rev" in df.columns else 0
+    if not encoding_normalized():
+        df, _ = repair_encoding(df)
+    return normalize_evibench(df)
+
+
+def merge_changed(df, changed):
+    """Replace rows of df with the rows in changed that have the same _id."""
+    if changed.empty:
+        return df
+    kept = df[~df["_id"].isin(changed["_id"])]
+    return normalize_evibench(pd.concat([kept, changed], ignore_index=True))
+
+
+def refresh_snapshot(revision=None, path=SNAPSHOT_PATH):
+    """Bring the local snapshot up to the published revision; returns that revision."""
+    if revision is None:
+        revision = current_revision()
+    snap_current = snapshot_revision(path) == revision
+    if snap_current and corpus_revision() == revision:
+        return revision
+    df, snap_revision = read_snapshot(path)
+    if snap_current and df is not None and "_id" in df.columns:
+        # only the memory-mapped copy is missing or stale
+        write_corpus(df, revision)
+        return revision
+    if df is None or "_id" not in df.columns:
+        # rows of older snapshots carry no _id to merge on; start over
+        df = fetch_evibench({})
+    else:
+        df = merge_changed(df, fetch_evibench({"_rev": {"$gt": snap_revision}}))
+    write_snapshot(df, revision, path)
+    write_corpus(df, revision)
+    return revision
+
+
+def build_user_index(df):
+    """Map each stripped, lowercased email to {QID: row position} in assignment order."""
+    index = {}
+    for pos, (email, qid) in enumerate(zip(df["Email"].str.strip().str.lower(), df["QID"])):
+        # keep the first row per (email, QID), same as the old .iloc[0]
+        index.setdefault(email, {}).setdefault(int(qid), pos)
+    return index
+
+
+class MetaCache:
+    """Metadata frame kept in step with the published corpus revision.
+
+    A new process starts from the local snapshot when there is one and
+    from a full Mongo read otherwise. After that a background thread
+    checks the revision and merges in only documents with a newer _rev.
+    Workers never rewrite the snapshot files themselves; build_snapshot.py
+    publishes them and workers remap the new corpus file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._refreshing = False
+        self.revision = None
+        self.df = None
+        self.index = {}
+        self.revs = {}
+
+    def get(self):
+        with self._lock:
+            if self.df is None:
+                self._load_initial()
+            if not self._refreshing and time.monotonic() - self._checked_at > REVISION_CHECK_SEC:
+                self._refreshing = True
+                self._checked_at = time.monotonic()
+                threading.Thread(target=self._refresh, name="corpus-refresh", daemon=True).start()
+            return self.df, self.index
+
+    def _load_initial(self):
+        df, revision = read_snapshot(columns=META_FIELDS)
+        if df is None:
+            revision = current_revision()
+            df = fetch_evibench({}, META_FIELDS)
+            self._checked_at = time.monotonic()
+        self._set_frame(df, revision)
+
+    def _refresh(self):
+        try:
+            revision = current_revision()
+            if revision != self.revision:
+                changed = fetch_evibench({"_rev": {"$gt": self.revision}}, META_FIELDS)
+                with self._lock:
+                    self._set_frame(merge_changed(self.df, changed), revision)
+        finally:
+            self._refreshing = False
+
+    def _set_frame(self, df, revision):
+        self.df = normalize_evibench(df)
+        self.index = build_user_index(self.df)
+        # copies of a double-annotated QID can differ in _rev; the newest wins
+        revs = self.df.groupby("QID")["_rev"].max()
+        self.revs = dict(zip(revs.index.astype(int), revs.astype(int)))
+        self.revision = revision
+
+
+@st.cache_resource
+def get_meta_cache():
+    return MetaCache()
+
+
+def load_evibench_meta():
+    """QID, Qtopic, Email and revision of every evibench question, without any text."""
+    df, _ = get_meta_cache().get()
+    return df
+
+
+def load_user_index():
+    _, index = get_meta_cache().get()
+    return index
+
+
+@st.cache_resource
+def get_shared_corpus():
+    return SharedCorpus()
+
+
+def get_question(qid):
+    """Question, answers and references of one QID.
+
+    Served from the memory-mapped corpus file when it is current for this
+    question, otherwise read from Mongo on first use.
+    """
+    qid = int(qid)
+    rev = get_meta_cache().revs.get(qid, 0)
+    row, corpus_rev = get_shared_corpus().row(qid)
+    if row is not None and corpus_rev >= rev:
+        question = {field: row.get(field, "") for field in TEXT_FIELDS}
+        question["QID"] = qid
+        return question
+    # keyed by revision too, so a changed question misses the cache
+    return fetch_question(qid, rev)
+
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def fetch_question(qid, rev):
+    projection = {field: 1 for field in TEXT_FIELDS}
+    projection["_id"] = 0
+    doc = get_evibench().find_one({"QID": int(qid)}, projection) or {}
+    question = {field: doc.get(field, "") for field in TEXT_FIELDS}
+    if not encoding_normalized():
+        question = {field: fix_encoding(val) for field, val in question.items()}
+    question["QID"] = int(qid)
+    return question
+
+
+def text_cache_stats():
+    info = fetch_question.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+    }
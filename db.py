@@ -0,0 +1,155 @@
+import threading
+import time
+
+import streamlit as st
+from pymongo import MongoClient, monitoring
+
+import profiling
+
+# Pool settings for the one client each process shares
+MAX_POOL_SIZE = 50
+MIN_POOL_SIZE = 5
+WAIT_QUEUE_TIMEOUT_MS = 10000
+SERVER_SELECTION_TIMEOUT_MS = 10000
+
+# Collection names
+RESPONSES = "responses_2"
+EDITS = "response_edits"
+# Newest submitted or edited version of every (email, qid)
+LATEST = "responses_latest"
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Counts checked-out connections and how long checkouts wait."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = threading.local()
+        self.checked_out = 0
+        self.open_connections = 0
+        self.checkouts = 0
+        self.failed_checkouts = 0
+        self.total_wait_sec = 0.0
+        self.max_wait_sec = 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checked_out": self.checked_out,
+                "open_connections": self.open_connections,
+                "checkouts": self.checkouts,
+                "failed_checkouts": self.failed_checkouts,
+                "avg_wait_ms": 1000 * self.total_wait_sec / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": 1000 * self.max_wait_sec,
+            }
+
+    def connection_check_out_started(self, event):
+        self._started.t = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait = time.perf_counter() - getattr(self._started, "t", time.perf_counter())
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.total_wait_sec += wait
+            self.max_wait_sec = max(self.max_wait_sec, wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.failed_checkouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+# One client per process, shared by every page, rerun and script
+@st.cache_resource
+def get_client():
+    metrics = PoolMetrics()
+    listeners = [metrics]
+    if profiling.ENABLED:
+        listeners.append(profiling.CommandProfiler())
+    client = MongoClient(
+        st.secrets["MONGO_URI"],
+        maxPoolSize=MAX_POOL_SIZE,
+        minPoolSize=MIN_POOL_SIZE,
+        waitQueueTimeoutMS=WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+        event_listeners=listeners,
+    )
+    # warm up: select a server and open the first connection now
+    client.admin.command("ping")
+    return client, metrics
+
+
+def written_between(since, until=None):
+    """Query for documents the writer stored in (since, until].
+
+    Documents from before the writer stamped written_at are placed by
+    their submit timestamp instead.
+    """
+    window = {"$gt": since}
+    if until is not None:
+        window["$lte"] = until
+    return {"$or": [
+        {"written_at": window},
+        {"written_at": {"$exists": False}, "timestamp": window},
+    ]}
+
+
+def get_db():
+    client, _ = get_client()
+    return client["database"]
+
+
+def get_evibench():
+    return get_db()["evibench"]
+
+
+def get_users():
+    return get_db()["users"]
+
+
+def get_responses():
+    return get_db()[RESPONSES]
+
+
+def get_edits():
+    return get_db()[EDITS]
+
+
+def get_latest():
+    return get_db()[LATEST]
+
+
+def get_meta():
+    return get_db()["meta"]
+
+
+def pool_metrics():
+    _, metrics = get_client()
+    return metrics.snapshot()
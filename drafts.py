@@ -0,0 +1,101 @@
+import datetime
+import threading
+import time
+
+import streamlit as st
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import PyMongoError
+
+from db import get_db
+
+# How long to wait for more changes before writing a batch of drafts
+DEBOUNCE_SEC = 2.0
+
+
+class DraftStore:
+    """Debounced, coalesced autosave of unfinished responses.
+
+    Changes are staged as {path: value} per (email, qid), where path is a
+    key of current_responses such as "Answer2" or
+    "reference_ratings.Reference3". A background thread writes each batch
+    as targeted $set updates, so only the parts that changed are sent.
+    """
+
+    def __init__(self, collection, debounce_sec=DEBOUNCE_SEC):
+        self.collection = collection
+        self.debounce_sec = debounce_sec
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._staged = {}
+        self._thread = threading.Thread(target=self._run, name="draft-flusher", daemon=True)
+        self._thread.start()
+
+    def stage(self, email, qid, path, value):
+        with self._lock:
+            ops = self._staged.setdefault((email, qid), {"delete": False, "set": {}})
+            ops["set"][path] = value
+        self._wake.set()
+
+    def discard(self, email, qid):
+        """Drop the draft once its question is submitted."""
+        with self._lock:
+            self._staged[(email, qid)] = {"delete": True, "set": {}}
+        self._wake.set()
+
+    def load(self, email):
+        """Saved drafts of this user keyed by qid."""
+        return {
+            doc["qid"]: doc.get("responses", {})
+            for doc in self.collection.find({"email": email}, {"qid": 1, "responses": 1, "_id": 0})
+        }
+
+    def flush(self):
+        with self._lock:
+            staged, self._staged = self._staged, {}
+        if not staged:
+            return
+        now = datetime.datetime.utcnow()
+        requests = []
+        for (email, qid), ops in staged.items():
+            key = {"email": email, "qid": qid}
+            if ops["delete"]:
+                requests.append(DeleteOne(key))
+            if ops["set"]:
+                update = {f"responses.{path}": value for path, value in ops["set"].items()}
+                update["updated_at"] = now
+                requests.append(UpdateOne(key, {"$set": update}, upsert=True))
+        try:
+            self.collection.bulk_write(requests, ordered=True)
+            self.last_error = None
+        except PyMongoError as e:
+            self.last_error = str(e)
+            self._restage(staged)
+
+    def _restage(self, staged):
+        # put a failed batch back without overwriting anything staged since
+        with self._lock:
+            for key, ops in staged.items():
+                newer = self._staged.get(key)
+                if newer is None:
+                    self._staged[key] = ops
+                elif not newer["delete"]:
+                    newer["set"] = {**ops["set"], **newer["set"]}
+                    newer["delete"] = ops["delete"]
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # let a burst of clicks coalesce into one write
+            time.sleep(self.debounce_sec)
+            self._wake.clear()
+            self.flush()
+            if self.last_error:
+                self._wake.set()
+
+
+@st.cache_resource
+def get_draft_store():
+    collection = get_db()["drafts"]
+    collection.create_index([("email", 1), ("qid", 1)], unique=True)
+    return DraftStore(collection)
@@ -0,0 +1,123 @@
+import copy
+
+from pymongo import ReplaceOne
+
+# Every Nth edit of a question is stored whole so rebuilding stays short
+SNAPSHOT_EVERY = 10
+
+
+def _escape(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(part):
+    return part.replace("~1", "/").replace("~0", "~")
+
+
+def diff(old, new, path=""):
+    """JSON-patch style ops turning old into new; lists are replaced whole."""
+    ops = []
+    for key in old:
+        if key not in new:
+            ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+    for key, value in new.items():
+        child = f"{path}/{_escape(key)}"
+        if key not in old:
+            ops.append({"op": "add", "path": child, "value": value})
+        elif isinstance(old[key], dict) and isinstance(value, dict):
+            ops.extend(diff(old[key], value, child))
+        elif old[key] != value:
+            ops.append({"op": "replace", "path": child, "value": value})
+    return ops
+
+
+def apply_patch(doc, ops):
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        parts = [_unescape(p) for p in op["path"].split("/")[1:]]
+        node = doc
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        if op["op"] == "remove":
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = copy.deepcopy(op["value"])
+    return doc
+
+
+def make_edit(doc, previous, prev_version):
+    """Edit log entry for doc, stored as a patch against previous when possible."""
+    version = prev_version + 1
+    record = {k: v for k, v in doc.items() if k != "responses"}
+    record["version"] = version
+    if previous is None or version % SNAPSHOT_EVERY == 0:
+        record["snapshot"] = True
+        record["responses"] = doc["responses"]
+    else:
+        record["snapshot"] = False
+        record["patch"] = diff(previous, doc["responses"])
+    return record
+
+
+def _is_snapshot(edit):
+    # edits written before delta encoding carry the full responses
+    return edit.get("snapshot", "patch" not in edit)
+
+
+def reconstruct(responses_collection, edits_collection, email, qid, version=None):
+    """Responses of (email, qid) as of an edit version; None means the newest.
+
+    Version 0 is the original submission.
+    """
+    key = {"email": email, "qid": qid}
+    if version == 0:
+        doc = responses_collection.find_one(key, {"responses": 1})
+        return doc.get("responses", {}) if doc else None
+    query = dict(key)
+    if version is not None:
+        query["version"] = {"$lte": version}
+
+    # walk back to the closest snapshot, then replay patches forward
+    chain = []
+    for edit in edits_collection.find(query).sort([("version", -1), ("timestamp", -1)]):
+        chain.append(edit)
+        if _is_snapshot(edit):
+            break
+    if chain and _is_snapshot(chain[-1]):
+        responses = chain.pop()["responses"]
+    else:
+        doc = responses_collection.find_one(key, {"responses": 1})
+        if doc is None:
+            return None
+        responses = doc.get("responses", {})
+    for edit in reversed(chain):
+        responses = apply_patch(responses, edit["patch"])
+    return responses
+
+
+def compact(responses_collection, edits_collection, email, qid):
+    """Rewrite one question's edit log as numbered patches plus snapshots.
+
+    Returns the number of edit documents rewritten.
+    """
+    edits = list(edits_collection.find({"email": email, "qid": qid}).sort("timestamp", 1))
+    if not edits:
+        return 0
+    base = responses_collection.find_one({"email": email, "qid": qid}, {"responses": 1})
+    previous = base.get("responses", {}) if base else None
+
+    ops = []
+    for prev_version, edit in enumerate(edits):
+        if _is_snapshot(edit):
+            responses = edit["responses"]
+        else:
+            responses = apply_patch(previous or {}, edit["patch"])
+        full = {k: v for k, v in edit.items() if k not in ("responses", "patch", "snapshot", "version")}
+        full["responses"] = responses
+        record = make_edit(full, previous, prev_version)
+        if record != edit:
+            ops.append(ReplaceOne({"_id": edit["_id"]}, record))
+        previous = responses
+    if ops:
+        edits_collection.bulk_write(ops, ordered=False)
+    return len(ops)
@@ -0,0 +1,174 @@
+import argparse
+import datetime
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from corpus import fetch_evibench
+from db import get_latest, get_responses, written_between
+
+BATCH_SIZE = 1000
+
+# One row per (email, qid, answer); reference N was shown next to answer N
+SCHEMA = pa.schema([
+    ("email", pa.string()),
+    ("qid", pa.int32()),
+    ("Qtopic", pa.string()),
+    ("answer", pa.int8()),
+    ("version", pa.int32()),
+    ("timestamp", pa.timestamp("ms")),
+    ("accuracy", pa.string()),
+    ("accuracy_explanation", pa.string()),
+    ("comprehension", pa.int8()),
+    ("novelty", pa.string()),
+    ("analysis_category", pa.string()),
+    ("analysis_details", pa.list_(pa.string())),
+    ("analysis_others", pa.string()),
+    ("feedback", pa.string()),
+    ("time_spent_sec", pa.float64()),
+    ("is_best", pa.bool_()),
+    ("reference_rating", pa.string()),
+    ("reference_comment", pa.string()),
+    ("preferred_reference", pa.int8()),
+])
+
+
+def _number(label, prefix):
+    """1 for "Answer 1" / "Reference 1", None otherwise."""
+    if isinstance(label, str) and label.startswith(prefix):
+        try:
+            return int(label[len(prefix):])
+        except ValueError:
+            return None
+    return None
+
+
+def flatten_response(doc):
+    """Rows of one responses document, one per rated answer."""
+    responses = doc.get("responses") or {}
+    best = {_number(label, "Answer ") for label in responses.get("best_answers") or []}
+    refs = responses.get("reference_ratings") or {}
+    preferred = _number(responses.get("preferred_reference"), "Reference ")
+    rows = []
+    for i in range(1, 5):
+        answer = responses.get(f"Answer{i}") or {}
+        accuracy = answer.get("accuracy") or {}
+        analysis = answer.get("analysis_logic") or {}
+        ref = refs.get(f"Reference{i}") or {}
+        rows.append({
+            "email": doc["email"],
+            "qid": doc["qid"],
+            "answer": i,
+            "version": doc.get("version", 0),
+            "timestamp": doc.get("timestamp"),
+            "accuracy": accuracy.get("rating"),
+            "accuracy_explanation": accuracy.get("explanation"),
+            "comprehension": answer.get("comprehension"),
+            "novelty": answer.get("novelty"),
+            "analysis_category": analysis.get("category"),
+            "analysis_details": analysis.get("details") or [],
+            "analysis_others": analysis.get("others_explanation"),
+            "feedback": answer.get("feedback"),
+            "time_spent_sec": answer.get("time_spent_sec"),
+            "is_best": i in best,
+            "reference_rating": ref.get("rating"),
+            "reference_comment": ref.get("comment"),
+            "preferred_reference": preferred,
+        })
+    return rows
+
+
+def load_topics():
+    """Qtopic per QID; double-annotated questions have one document per annotator."""
+    meta = fetch_evibench({}, ["QID", "Qtopic"])
+    meta = meta.drop_duplicates("QID").rename(columns={"QID": "qid"})
+    return meta.astype({"qid": "int32", "Qtopic": object})
+
+
+def iter_batches(collection, query, batch_size=BATCH_SIZE):
+    """Documents of collection in lists of batch_size, fetched by a batched cursor."""
+    batch = []
+    for doc in collection.find(query, {"_id": 0}).batch_size(batch_size):
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def to_table(docs, topics):
+    df = pd.DataFrame([row for doc in docs for row in flatten_response(doc)])
+    df["qid"] = df["qid"].astype("int32")
+    df = df.merge(topics, on="qid", how="left")
+    return pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+
+
+def for_csv(table):
+    """CSV has no list type; join the analysis details with "; "."""
+    i = table.schema.get_field_index("analysis_details")
+    joined = pc.binary_join(table.column(i), "; ")
+    return table.set_column(i, pa.field("analysis_details", pa.string()), joined)
+
+
+def export(out_path, fmt="parquet", with_edits=True, since=None, batch_size=BATCH_SIZE):
+    """Stream responses into out_path one batch at a time.
+
+    with_edits reads responses_latest, which holds the newest edited version
+    of every response; otherwise the original submissions in responses_2.
+    since limits the export to documents the writer stored after that
+    time; retried writes can land long after their submit timestamp.
+    Returns (rows written, newest write time seen).
+    """
+    collection = get_latest() if with_edits else get_responses()
+    query = written_between(since) if since else {}
+    topics = load_topics()
+
+    tmp_path = out_path + ".tmp"
+    writer = None
+    rows = 0
+    newest = None
+    try:
+        for docs in iter_batches(collection, query, batch_size):
+            table = to_table(docs, topics)
+            if fmt == "csv":
+                table = for_csv(table)
+            if writer is None:
+                writer = (pq.ParquetWriter if fmt == "parquet" else pacsv.CSVWriter)(tmp_path, table.schema)
+            writer.write_table(table)
+            rows += table.num_rows
+            batch_newest = max(doc.get("written_at", doc["timestamp"]) for doc in docs)
+            newest = batch_newest if newest is None else max(newest, batch_newest)
+        if writer is None:
+            empty = SCHEMA.empty_table()
+            if fmt == "parquet":
+                pq.write_table(empty, tmp_path)
+            else:
+                pacsv.write_csv(for_csv(empty), tmp_path)
+    finally:
+        if writer is not None:
+            writer.close()
+    # only replace a previous export once this one is complete
+    os.replace(tmp_path, out_path)
+    return rows, newest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export annotation responses as one row per (email, qid, answer).")
+    parser.add_argument("out", nargs="?", default="responses.parquet")
+    parser.add_argument("--format", choices=["parquet", "csv"], help="defaults to the extension of out")
+    parser.add_argument("--original", action="store_true", help="export first submissions, ignoring later edits")
+    parser.add_argument("--since", type=datetime.datetime.fromisoformat,
+                        help="only documents saved after this UTC time, e.g. 2025-01-31T12:00")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.out.endswith(".csv") else "parquet")
+    rows, newest = export(args.out, fmt, not args.original, args.since, args.batch_size)
+    print(f"Done. Rows: {rows}, written to {args.out}")
+    if newest is not None:
+        print(f"Next incremental run: --since {newest.isoformat()}")
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+
+import pandas as pd
+from pymongo import UpdateMany, UpdateOne
+
+from corpus import CorpusBusyError, begin_revision, corpus_writer, publish_revision, repair_encoding
+from db import get_evibench
+
+REQUIRED_COLUMNS = ["QID", "Qtopic", "Question", "Email"] + [
+    f"{kind}{i}" for i in range(1, 5) for kind in ("Answer", "Reference")
+]
+# Set by update_annotations.py once a question exists
+ASSIGNMENT_FIELDS = ["Email", "Annotator"]
+CHUNK_SIZE = 500
+CHECKPOINT_PATH = ".ingest_checkpoint.json"
+
+
+class IngestError(Exception):
+    pass
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    """Stream a CSV/TSV in bounded chunks, skipping unnamed trailing columns."""
+    sep = "\t" if path.endswith(".tsv") else ","
+    return pd.read_csv(
+        path,
+        sep=sep,
+        encoding="utf-8",
+        chunksize=chunk_size,
+        usecols=lambda col: not col.startswith("Unnamed"),
+    )
+
+
+def validate_columns(columns):
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing:
+        raise IngestError(f"Missing columns: {', '.join(missing)}")
+
+
+def chunk_to_records(chunk):
+    """Clean one chunk into Mongo-ready records, last row wins per QID."""
+    chunk = chunk.copy()
+    chunk["QID"] = pd.to_numeric(chunk["QID"], errors="coerce")
+    rejected = int(chunk["QID"].isna().sum())
+    chunk = chunk.dropna(subset=["QID"]).drop_duplicates("QID", keep="last")
+    chunk, _ = repair_encoding(chunk)
+    chunk = chunk.astype(object).where(chunk.notna(), None)
+    records = chunk.to_dict(orient="records")
+    for record in records:
+        record["QID"] = int(record["QID"])
+    return records, rejected
+
+
+def upsert_records(collection, records, revision=None):
+    """Write the question text of records; returns inserted, updated and unchanged rows.
+
+    A double-annotated QID has one document per annotator, so the text is
+    set on every copy. Email and Annotator are only written when a QID is
+    new: later assignments belong to update_annotations.py.
+    """
+    if not records:
+        return 0, 0, 0
+    copies = {}
+    for doc in collection.find({"QID": {"$in": [r["QID"] for r in records]}}, {"_id": 0}):
+        copies.setdefault(doc["QID"], []).append(doc)
+    ops = []
+    updated = unchanged = 0
+    for record in records:
+        text = {k: v for k, v in record.items() if k not in ASSIGNMENT_FIELDS}
+        assignment = {k: v for k, v in record.items() if k in ASSIGNMENT_FIELDS}
+        update = {"$set": {**text, "_rev": revision} if revision else text}
+        docs = copies.get(record["QID"])
+        if not docs:
+            ops.append(UpdateOne({"QID": record["QID"]}, {**update, "$setOnInsert": assignment}, upsert=True))
+        # only write rows that differ, so their _rev marks a real change
+        elif any(doc.get(k, object()) != v for doc in docs for k, v in text.items()):
+            ops.append(UpdateMany({"QID": record["QID"]}, update))
+            updated += 1
+        else:
+            unchanged += 1
+    if not ops:
+        return 0, 0, unchanged
+    result = collection.bulk_write(ops, ordered=False)
+    return result.upserted_count, updated, unchanged
+
+
+def load_checkpoint(path, checkpoint_path):
+    if not os.path.exists(checkpoint_path):
+        return 0
+    with open(checkpoint_path) as f:
+        state = json.load(f)
+    if state.get("file") != os.path.abspath(path) or state.get("mtime") != os.path.getmtime(path):
+        return 0
+    return state["chunks_done"]
+
+
+def save_checkpoint(path, checkpoint_path, chunks_done):
+    with open(checkpoint_path, "w") as f:
+        json.dump({
+            "file": os.path.abspath(path),
+            "mtime": os.path.getmtime(path),
+            "chunks_done": chunks_done,
+        }, f)
+
+
+def ingest(path, collection, chunk_size=CHUNK_SIZE, checkpoint_path=None, resume=False, revision=None):
+    """Upsert a CSV/TSV into evibench keyed on QID, one chunk at a time.
+
+    Existing questions keep their assignments; changed documents are
+    stamped with revision when one is given.
+    Returns counts of inserted, updated, unchanged and rejected rows.
+    """
+    collection.create_index("QID")
+    collection.create_index("_rev")
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0, "skipped_chunks": 0}
+    start = load_checkpoint(path, checkpoint_path) if (resume and checkpoint_path) else 0
+
+    for n, chunk in enumerate(read_chunks(path, chunk_size)):
+        if n == 0:
+            validate_columns(chunk.columns)
+        if n < start:
+            # already written by an earlier, interrupted run
+            stats["skipped_chunks"] += 1
+            continue
+        records, rejected = chunk_to_records(chunk)
+        inserted, updated, unchanged = upsert_records(collection, records, revision)
+        stats["inserted"] += inserted
+        stats["updated"] += updated
+        stats["unchanged"] += unchanged
+        stats["rejected"] += rejected
+        if checkpoint_path:
+            save_checkpoint(path, checkpoint_path, n + 1)
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upsert an evibench CSV/TSV into MongoDB.")
+    parser.add_argument("path", nargs="?", default="new_question_1214_chi.csv")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--resume", action="store_true", help="skip chunks finished by an interrupted run")
+    args = parser.parse_args()
+
+    try:
+        with corpus_writer("ingest.py"):
+            revision = begin_revision()
+            stats = ingest(
+                args.path,
+                get_evibench(),
+                chunk_size=args.chunk_size,
+                checkpoint_path=CHECKPOINT_PATH,
+                resume=args.resume,
+                revision=revision,
+            )
+            # running apps pick up the changed questions on their next check; a
+            # resumed run always publishes, since the interrupted run's documents
+            # carry its own, never published revision
+            if stats["inserted"] or stats["updated"] or stats["skipped_chunks"]:
+                publish_revision(revision)
+    except (IngestError, CorpusBusyError) as e:
+        raise SystemExit(f"Ingest failed: {e}")
+    print(
+        f"Done. Inserted: {stats['inserted']}, Updated: {stats['updated']}, "
+        f"Unchanged: {stats['unchanged']}, Rejected: {stats['rejected']}"
+    )
+    if stats["skipped_chunks"]:
+        print(f"Resumed after {stats['skipped_chunks']} chunks")
@@ -0,0 +1,16 @@
+import sys
+
+import pandas as pd
+
+from corpus import memory_report, normalize_evibench
+
+# Compare the raw evibench frame against its normalized form
+path = sys.argv[1] if len(sys.argv) > 1 else "new_question_1214_chi.csv"
+sep = "\t" if path.endswith(".tsv") else ","
+raw_df = pd.read_csv(path, sep=sep, encoding="utf-8")
+compact_df = normalize_evibench(raw_df)
+
+report = memory_report(raw_df, compact_df) / 1024
+print(report.round(1).to_string(na_rep="dropped"))
+print(f"\nRows: {len(raw_df)}, columns: {raw_df.shape[1]} -> {compact_df.shape[1]}")
+print(f"Saved {1 - report.loc['total', 'after'] / report.loc['total', 'before']:.0%}")
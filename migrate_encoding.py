@@ -0,0 +1,56 @@
+import datetime
+
+import pandas as pd
+from pymongo import UpdateOne
+
+from corpus import CORPUS_STATE_ID, repair_encoding
+from db import get_evibench, get_meta
+
+BATCH_SIZE = 1000
+
+evibench_collection = get_evibench()
+
+
+def repair_batch(docs):
+    df = pd.DataFrame(docs).set_index("_id")
+    repaired, changed = repair_encoding(df)
+    ops = []
+    for doc_id in changed.index[changed.any(axis=1)]:
+        cols = changed.columns[changed.loc[doc_id]]
+        ops.append(UpdateOne(
+            {"_id": doc_id},
+            {"$set": {col: repaired.at[doc_id, col] for col in cols}},
+        ))
+    if ops:
+        evibench_collection.bulk_write(ops, ordered=False)
+    return len(ops), int(changed.to_numpy().sum())
+
+
+def iter_batches(cursor):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Repair every document once so readers can skip fix_encoding
+scanned = docs_fixed = cells_fixed = 0
+for batch in iter_batches(evibench_collection.find({}, batch_size=BATCH_SIZE)):
+    n_docs, n_cells = repair_batch(batch)
+    scanned += len(batch)
+    docs_fixed += n_docs
+    cells_fixed += n_cells
+
+get_meta().update_one(
+    {"_id": CORPUS_STATE_ID},
+    {"$set": {
+        "encoding_normalized": True,
+        "normalized_at": datetime.datetime.utcnow(),
+    }},
+    upsert=True,
+)
+print(f"Done. Scanned: {scanned}, documents fixed: {docs_fixed}, cells fixed: {cells_fixed}")
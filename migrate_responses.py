@@ -0,0 +1,53 @@
+from pymongo import DeleteMany, ReplaceOne
+
+from db import EDITS, LATEST, RESPONSES, get_db
+from edit_history import reconstruct
+
+db = get_db()
+responses_collection = db[RESPONSES]
+edits_collection = db[EDITS]
+latest_collection = db[LATEST]
+
+# Drop duplicate submissions, keeping the earliest per (email, qid)
+duplicates = responses_collection.aggregate([
+    {"$sort": {"timestamp": 1}},
+    {"$group": {"_id": {"email": "$email", "qid": "$qid"}, "ids": {"$push": "$_id"}}},
+    {"$match": {"ids.1": {"$exists": True}}},
+], allowDiskUse=True)
+ops = [DeleteMany({"_id": {"$in": group["ids"][1:]}}) for group in duplicates]
+removed = responses_collection.bulk_write(ops, ordered=False).deleted_count if ops else 0
+
+responses_collection.create_index([("email", 1), ("qid", 1)], unique=True)
+edits_collection.create_index([("email", 1), ("qid", 1), ("timestamp", -1)])
+edits_collection.create_index([("email", 1), ("qid", 1), ("version", -1)])
+latest_collection.create_index([("email", 1), ("qid", 1)], unique=True)
+
+# Materialize the newest version of every question: submissions first,
+# then the rebuilt newest edit on top
+responses_collection.aggregate([
+    {"$project": {"_id": 0}},
+    {"$set": {"version": 0}},
+    {"$merge": {"into": LATEST, "on": ["email", "qid"], "whenMatched": "keepExisting"}},
+])
+edited = edits_collection.aggregate([
+    {"$group": {
+        "_id": {"email": "$email", "qid": "$qid"},
+        "timestamp": {"$max": "$timestamp"},
+        "version": {"$sum": 1},
+    }},
+], allowDiskUse=True)
+ops = []
+for group in edited:
+    key = group["_id"]
+    responses = reconstruct(responses_collection, edits_collection, key["email"], key["qid"])
+    ops.append(ReplaceOne(key, {
+        **key,
+        "responses": responses,
+        "timestamp": group["timestamp"],
+        "version": group["version"],
+    }, upsert=True))
+if ops:
+    latest_collection.bulk_write(ops, ordered=False)
+
+print(f"Done. Duplicate submissions removed: {removed}, "
+      f"latest versions: {latest_collection.count_documents({})}")
@@ -0,0 +1,68 @@
+import streamlit as st
+
+PAGE_SIZE = 25
+FILTERS = ["All", "To do", "Done"]
+
+
+def _badge(qid, completed_qids):
+    return f"✅ QID {qid}" if qid in completed_qids else f"⬜ QID {qid}"
+
+
+def render_navigator(user_qids, completed_qids, current_qid, on_select):
+    """Sidebar question list: one page of QIDs at a time with completion badges.
+
+    Only PAGE_SIZE options are sent to the browser per rerun, however many
+    questions the user has been assigned. on_select(qid) is called when the
+    user picks a different question.
+    """
+    remaining = [qid for qid in user_qids if qid not in completed_qids]
+    if st.sidebar.button("⏭ Next incomplete", disabled=not remaining, key="nav_next_incomplete"):
+        on_select(remaining[0])
+
+    view = st.sidebar.radio(
+        "Show", FILTERS, horizontal=True, key="nav_filter",
+        format_func=lambda f: f"{f} ({len(remaining)})" if f == "To do" else f,
+    )
+    if view == "To do":
+        qids = remaining
+    elif view == "Done":
+        qids = [qid for qid in user_qids if qid in completed_qids]
+    else:
+        qids = user_qids
+    if not qids:
+        st.sidebar.caption("No questions in this view.")
+        return
+
+    n_pages = (len(qids) - 1) // PAGE_SIZE + 1
+    # follow the current question to its page when it changes, e.g. after Submit
+    if st.session_state.get("nav_followed") != (current_qid, view):
+        st.session_state.nav_followed = (current_qid, view)
+        if current_qid in qids:
+            st.session_state.nav_page = qids.index(current_qid) // PAGE_SIZE
+    page = min(st.session_state.get("nav_page", 0), n_pages - 1)
+
+    if n_pages > 1:
+        cols = st.sidebar.columns([1, 2, 1])
+        with cols[0]:
+            if st.button("◀", disabled=page == 0, key="nav_prev_page"):
+                st.session_state.nav_page = page - 1
+                st.rerun()
+        with cols[1]:
+            st.caption(f"Page {page + 1} of {n_pages}")
+        with cols[2]:
+            if st.button("▶", disabled=page == n_pages - 1, key="nav_next_page"):
+                st.session_state.nav_page = page + 1
+                st.rerun()
+
+    page_qids = qids[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+    # keyed by the current QID so the selection resets whenever it moves
+    picked = st.sidebar.radio(
+        "Questions",
+        page_qids,
+        index=page_qids.index(current_qid) if current_qid in page_qids else None,
+        format_func=lambda qid: _badge(qid, completed_qids),
+        label_visibility="collapsed",
+        key=f"nav_pick_{current_qid}",
+    )
+    if picked is not None and picked != current_qid:
+        on_select(picked)
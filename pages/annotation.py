@@ -1,19 +1,17 @@
 import streamlit as st
-import pandas as pd
 import datetime
-from pymongo import MongoClient
 import time
 import re
+import copy
 
-
-def fix_encoding(val):
-    """Fix mojibake: UTF-8 bytes that were decoded as Latin-1."""
-    if isinstance(val, str):
-        try:
-            return val.encode("latin-1").decode("utf-8")
-        except (UnicodeDecodeError, UnicodeEncodeError):
-            return val
-    return val
+import profiling
+from admin import is_admin, render_debug_panel
+from corpus import get_question, load_user_index
+from db import get_edits, get_latest, get_responses
+from drafts import get_draft_store
+from navigator import render_navigator
+from prefetch import get_prefetcher
+from writer import get_writer
 
 
 def linkify_urls(text):
@@ -32,30 +30,13 @@ st.markdown("""
 
 MAX_ANSWER = 5
 
-# Cache evibench + db
-@st.cache_data
-def load_evibench():
-    client = MongoClient(st.secrets["MONGO_URI"])
-    db = client["database"]
-    evibench_collection = db["evibench"]
-
-    docs = list(evibench_collection.find({}, {"_id": 0}))
-    df = pd.DataFrame(docs)
-    str_cols = df.select_dtypes(include="object").columns
-    df[str_cols] = df[str_cols].map(fix_encoding)
-    return df
-
-@st.cache_resource
-def get_db():
-    MONGO_URI = st.secrets["MONGO_URI"]
-    client = MongoClient(MONGO_URI)
-    return client["database"]
-
 # Load in db 
-evibench_df = load_evibench()
-db = get_db()
-responses_collection = db["responses_2"]
-edits_collection = db["response_edits"]
+responses_collection = get_responses()
+edits_collection = get_edits()
+latest_collection = get_latest()
+writer = get_writer()
+draft_store = get_draft_store()
+prefetcher = get_prefetcher()
 
 # Check if user is logged in 
 if "logged_in" not in st.session_state or not st.session_state.logged_in:
@@ -63,71 +44,166 @@ if "logged_in" not in st.session_state or not st.session_state.logged_in:
     st.switch_page("app.py")
 
 user_email = st.session_state.user_email
-user_df = evibench_df[evibench_df['Email'].str.lower() == user_email]
-
-completed_qids_ptr = responses_collection.find(
-    {"email": user_email}, {"qid": 1, "_id": 0}
-)
-completed_qids = {doc["qid"] for doc in completed_qids_ptr}
-uncompleted_qids = user_df[~user_df['QID'].isin(completed_qids)]
+profiling.start_rerun(st.session_state, "annotation", user=user_email)
+
+with profiling.phase("user_index"):
+    user_qid_pos = load_user_index().get(user_email, {})
+    user_qids = list(user_qid_pos)
+
+if not user_qids:
+    # all of this user's questions were reassigned since they logged in
+    st.warning("You have no questions assigned right now. Please contact the study coordinator.")
+    if is_admin(user_email):
+        st.page_link("pages/dashboard.py", label="📊 Study progress")
+    profiling.finish_rerun(st.session_state)
+    st.stop()
+
+def load_user_progress(refresh=False):
+    """Read this user's completed QIDs, saved responses and drafts once per session."""
+    if refresh or st.session_state.get("progress_email") != user_email:
+        # responses_latest holds the newest submitted or edited version
+        saved = {
+            doc["qid"]: doc.get("responses", {})
+            for doc in latest_collection.find(
+                {"email": user_email}, {"qid": 1, "responses": 1, "_id": 0}
+            )
+        }
+        completed = set(saved)
+        # submissions still in the write-behind queue count as saved
+        for doc in writer.pending_docs(responses_collection.name, user_email):
+            completed.add(doc["qid"])
+            saved[doc["qid"]] = doc["responses"]
+        for doc in sorted(writer.pending_docs(edits_collection.name, user_email), key=lambda d: d["timestamp"]):
+            saved[doc["qid"]] = doc["responses"]
+        # write out anything still debouncing so the reload sees it
+        draft_store.flush()
+        st.session_state.drafts = draft_store.load(user_email)
+        st.session_state.completed_qids = completed
+        st.session_state.saved_responses = saved
+        st.session_state.progress_email = user_email
+    return st.session_state.completed_qids, st.session_state.saved_responses, st.session_state.drafts
+
+with profiling.phase("progress"):
+    completed_qids, saved_responses, drafts = load_user_progress()
+uncompleted_qids = [qid for qid in user_qids if qid not in completed_qids]
+
+def next_uncompleted_qid(done):
+    remaining = [qid for qid in user_qids if qid not in done]
+    if remaining:
+        return remaining[0]
+    # All done — move to the next question in the list after the current one
+    current = st.session_state.current_qid
+    if current in user_qid_pos:
+        curr_idx = user_qids.index(current)
+        return user_qids[(curr_idx + 1) % len(user_qids)]
+    return user_qids[0]
 
 def go_to_next_uncompleted():
-    completed_qids_ptr = responses_collection.find(
-        {"email": user_email}, {"qid": 1, "_id": 0}
-    )
-    completed = {doc["qid"] for doc in completed_qids_ptr}
-    remaining = user_df[~user_df["QID"].isin(completed)]
-    if not remaining.empty:
-        next_qid = remaining.iloc[0]["QID"]
-        st.session_state.current_qid = next_qid
-        st.session_state.answer_idx = 0
-        st.session_state.current_responses = {}
+    next_qid = next_uncompleted_qid(completed_qids)
+    prefetched = prefetcher.take(st.session_state, next_qid)
+    st.session_state.current_qid = next_qid
+    st.session_state.answer_idx = 0
+    if prefetched is not None:
+        st.session_state.question_row = prefetched["row"]
+        st.session_state.current_responses = prefetched["responses"]
     else:
-        # All done — move to the next question in the list after the current one
-        all_qids = user_df["QID"].tolist()
-        current = st.session_state.current_qid
-        if current in all_qids:
-            curr_idx = all_qids.index(current)
-            next_idx = (curr_idx + 1) % len(all_qids)
-            st.session_state.current_qid = all_qids[next_idx]
-        else:
-            st.session_state.current_qid = all_qids[0]
-        st.session_state.answer_idx = 0
-        st.session_state.current_responses = load_saved_response(st.session_state.current_qid)
+        st.session_state.current_responses = load_saved_response(next_qid)
+
+def prepare_question(qid):
+    """Question text with the references already linkified."""
+    row = dict(get_question(qid))
+    row["linked_refs"] = {
+        f"Reference{i}": linkify_urls(row[f"Reference{i}"]) for i in range(1, 5)
+    }
+    return row
+
+def load_question(qid):
+    """The current question, prepared once and kept for the reruns spent on it."""
+    row = st.session_state.get("question_row")
+    if row is None or row["QID"] != int(qid):
+        row = prepare_question(qid)
+        st.session_state.question_row = row
+    return row
+
+def prefetch_question(qid):
+    # runs on a prefetch thread: only reads this rerun's caches
+    return {"row": prepare_question(qid), "responses": load_saved_response(qid)}
 
 def load_saved_response(qid):
-    doc = responses_collection.find_one({"email": user_email, "qid": int(qid)})
-    if doc:
-        return doc.get("responses", {})
-    return {}
+    # copy so unsaved changes never leak back into the session cache
+    responses = copy.deepcopy(saved_responses.get(int(qid), {}))
+    draft = copy.deepcopy(drafts.get(int(qid), {}))
+    # an unsubmitted draft wins over the last submitted version
+    if "reference_ratings" in draft:
+        draft["reference_ratings"] = {
+            **(responses.get("reference_ratings") or {}),
+            **draft["reference_ratings"],
+        }
+    responses.update(draft)
+    return responses
+
+def save_draft(updates):
+    """Apply updates to current_responses and autosave only the parts that changed."""
+    qid = int(st.session_state.current_qid)
+    responses = st.session_state.current_responses
+    for key, value in updates.items():
+        if key == "reference_ratings":
+            old_refs = responses.get(key) or {}
+            for ref_key, ref_value in value.items():
+                if old_refs.get(ref_key) != ref_value:
+                    draft_store.stage(user_email, qid, f"{key}.{ref_key}", ref_value)
+        elif responses.get(key) != value:
+            draft_store.stage(user_email, qid, key, value)
+        responses[key] = value
+    drafts[qid] = copy.deepcopy(responses)
 
 def switch_question(target_qid):
+    prefetcher.cancel(st.session_state)
     st.session_state.current_qid = target_qid
     st.session_state.answer_idx = 0
-    if target_qid in completed_qids:
-        st.session_state.current_responses = load_saved_response(target_qid)
-    else:
-        st.session_state.current_responses = {}
+    st.session_state.current_responses = load_saved_response(target_qid)
     st.rerun()
 
 st.sidebar.markdown("## 📋 Your Questions")
-user_qids = user_df["QID"].tolist()
+if st.sidebar.button("🔄 Refresh progress"):
+    prefetcher.cancel(st.session_state)
+    load_user_progress(refresh=True)
+    st.rerun()
+
+# Show whether queued submissions have reached the database
+st.session_state.failed_writes = st.session_state.get("failed_writes", []) + [
+    writer.failure(write_id) for write_id in st.session_state.get("pending_writes", [])
+    if writer.failure(write_id)
+]
+st.session_state.pending_writes = [
+    write_id for write_id in st.session_state.get("pending_writes", [])
+    if writer.is_pending(write_id)
+]
+if st.session_state.failed_writes:
+    st.sidebar.error(
+        f"{len(st.session_state.failed_writes)} submission(s) could not be saved "
+        f"({st.session_state.failed_writes[-1]}). Please tell the study coordinator."
+    )
+if st.session_state.pending_writes:
+    st.sidebar.caption(f"⏳ Saving {len(st.session_state.pending_writes)} submission(s)...")
+    if writer.last_error:
+        st.sidebar.warning("Database is unreachable. Your answers are stored locally and will be retried.")
+elif st.session_state.get("progress_email") == user_email and completed_qids:
+    st.sidebar.caption("✅ All submissions saved")
 if "current_qid" not in st.session_state:
-    first_qid = uncompleted_qids.iloc[0]["QID"] if not uncompleted_qids.empty else user_qids[0]
+    first_qid = uncompleted_qids[0] if uncompleted_qids else user_qids[0]
     st.session_state.current_qid = first_qid
-    if first_qid in completed_qids:
-        st.session_state.current_responses = load_saved_response(first_qid)
-    else:
-        st.session_state.current_responses = {}
+    st.session_state.current_responses = load_saved_response(first_qid)
 
-for qid in user_qids:
-    is_current = (qid == st.session_state.current_qid)
-    label = f"➡️ QID {qid}" if is_current else f"QID {qid}"
-    if st.sidebar.button(label, key=f"goto_{qid}"):
-        switch_question(qid)
+with profiling.phase("sidebar"):
+    render_navigator(user_qids, completed_qids, st.session_state.current_qid, switch_question)
+
+if is_admin(user_email):
+    st.sidebar.page_link("pages/dashboard.py", label="📊 Study progress")
+    render_debug_panel()
 
 # Check the progress of the user
-total = len(user_df)
+total = len(user_qids)
 completed = len(completed_qids)
 
 if "start_time" not in st.session_state:
@@ -150,24 +226,10 @@ with col2:
 
 st.divider()
 
-# Display
-if uncompleted_qids.empty:
-    st.info("You've completed all annotations. You may review and edit your previous responses.")
-
-if st.session_state.current_qid is not None:
-    row = user_df[user_df["QID"] == st.session_state.current_qid].iloc[0]
-    st.markdown("### 📌 Topic")
-    st.info(row['Qtopic'])
-    with st.expander("❓ Question"):
-        st.write(row['Question'])
-    
-    if "answer_idx" not in st.session_state:
-        st.session_state.answer_idx = 0
-    if "current_responses" not in st.session_state:
-        st.session_state.current_responses = {}
-
-    idx = st.session_state.answer_idx
-    
+# Each evaluation step is a fragment: widget changes rerun only that step,
+# while Back/Next/Submit call st.rerun() to redraw the whole page.
+@st.fragment
+def answer_form(row, idx):
     # save the current values
     saved = st.session_state.current_responses.get(f"Answer{idx+1}", {})
 
@@ -189,401 +251,447 @@ if st.session_state.current_qid is not None:
     analysis_other_default = get_saved(["analysis_logic", "others_explanation"], "")
     other_comments_default = get_saved(["feedback"], "")
 
+    ans_col = f"Answer{idx+1}"
+    ref_col = f"Reference{idx+1}"
 
-    # Only show answers when idx is less than 4
-    if idx < 4:
-        ans_col = f"Answer{idx+1}"
-        ref_col = f"Reference{idx+1}"
-
-        with st.expander(f"📝 Answer {idx+1}"):
-            st.write(row[ans_col])
+    with st.expander(f"📝 Answer {idx+1}"):
+        st.write(row[ans_col])
 
-        with st.expander(f"📚 Reference {idx+1}"):
-            st.markdown(linkify_urls(row[ref_col]))
+    with st.expander(f"📚 Reference {idx+1}"):
+        st.markdown(row["linked_refs"][ref_col])
 
-        # Eval Topics
-        accuracy = st.radio(
-            "How accurate was the answer? (i.e. were the facts, claims, and conclusions scientifically correct and supported by the references?)",
-            ["High", "Moderate", "Low Accuracy"],
-            index=(["High","Moderate","Low Accuracy"].index(accuracy_default)
-                if accuracy_default else None),
-            key=f"accuracy_{row['QID']}_{idx+1}"
-        )
-        
-        # clear the accuracy comment when change
-        prev_accuracy_key = f"prev_accuracy_{row['QID']}_{idx+1}"
-        if prev_accuracy_key not in st.session_state:
-            st.session_state[prev_accuracy_key] = accuracy
-
-        # if the user changes radio then update
-        explain_key = f"accuracy_explain_{row['QID']}_{idx+1}"
-        if accuracy != st.session_state[prev_accuracy_key]:
-            if explain_key in st.session_state:
-                st.session_state[explain_key] = ""
-
-        # update previous key
+    # Eval Topics
+    accuracy = st.radio(
+        "How accurate was the answer? (i.e. were the facts, claims, and conclusions scientifically correct and supported by the references?)",
+        ["High", "Moderate", "Low Accuracy"],
+        index=(["High","Moderate","Low Accuracy"].index(accuracy_default)
+            if accuracy_default else None),
+        key=f"accuracy_{row['QID']}_{idx+1}"
+    )
+    
+    # clear the accuracy comment when change
+    prev_accuracy_key = f"prev_accuracy_{row['QID']}_{idx+1}"
+    if prev_accuracy_key not in st.session_state:
         st.session_state[prev_accuracy_key] = accuracy
 
-        # require explanation for moderate or low answers
-        if accuracy == "Moderate":
-            accuracy_explain = st.text_area(
-                "Please explain why the accuracy was moderate (optional):",
-                value=accuracy_explain_default,
-                key=f"accuracy_explain_{row['QID']}_{idx+1}",
-                height=80
-            )
-        elif accuracy == "Low Accuracy":
-            accuracy_explain = st.text_area(
-                "Please explain why the accuracy was low (optional):",
-                value=accuracy_explain_default,
-                key=f"accuracy_explain_{row['QID']}_{idx+1}",
-                height=80
-            )
-        else:
-            accuracy_explain = None
-
-        comp = st.slider(
-            "How comprehensive was the answer? (i.e. did it fully address all aspects of the question, or were there gaps in coverage?)",
-            1, 5,
-            value=comp_default,
-            key=f"comp_{row['QID']}_{idx+1}"
+    # if the user changes radio then update
+    explain_key = f"accuracy_explain_{row['QID']}_{idx+1}"
+    if accuracy != st.session_state[prev_accuracy_key]:
+        if explain_key in st.session_state:
+            st.session_state[explain_key] = ""
+
+    # update previous key
+    st.session_state[prev_accuracy_key] = accuracy
+
+    # require explanation for moderate or low answers
+    if accuracy == "Moderate":
+        accuracy_explain = st.text_area(
+            "Please explain why the accuracy was moderate (optional):",
+            value=accuracy_explain_default,
+            key=f"accuracy_explain_{row['QID']}_{idx+1}",
+            height=80
         )
-
-        novel = st.radio(
-            "Were there any novel insights? (i.e. correct information that is often overlooked or underappreciated)",
-            ["Yes", "No", "Maybe"],
-            index=(["Yes","No","Maybe"].index(novel_default)
-                if novel_default else None),
-            key=f"novel_{row['QID']}_{idx+1}"
+    elif accuracy == "Low Accuracy":
+        accuracy_explain = st.text_area(
+            "Please explain why the accuracy was low (optional):",
+            value=accuracy_explain_default,
+            key=f"accuracy_explain_{row['QID']}_{idx+1}",
+            height=80
         )
-        analysis_cat = st.radio(
-            "How was the analysis quality? (i.e. how well did the answer break down and reason through the question?)",
-            ["Good", "Average", "Bad"],
-            index=(["Good","Average","Bad"].index(analysis_cat_default)
-                if analysis_cat_default else None),
-            key=f"analysis_cat_{row['QID']}_{idx+1}"
+    else:
+        accuracy_explain = None
+
+    comp = st.slider(
+        "How comprehensive was the answer? (i.e. did it fully address all aspects of the question, or were there gaps in coverage?)",
+        1, 5,
+        value=comp_default,
+        key=f"comp_{row['QID']}_{idx+1}"
+    )
+
+    novel = st.radio(
+        "Were there any novel insights? (i.e. correct information that is often overlooked or underappreciated)",
+        ["Yes", "No", "Maybe"],
+        index=(["Yes","No","Maybe"].index(novel_default)
+            if novel_default else None),
+        key=f"novel_{row['QID']}_{idx+1}"
+    )
+    analysis_cat = st.radio(
+        "How was the analysis quality? (i.e. how well did the answer break down and reason through the question?)",
+        ["Good", "Average", "Bad"],
+        index=(["Good","Average","Bad"].index(analysis_cat_default)
+            if analysis_cat_default else None),
+        key=f"analysis_cat_{row['QID']}_{idx+1}"
+    )
+    # reset if category changes
+    if analysis_cat != analysis_cat_default:
+        analysis_detail_default = []
+        analysis_other_default = ""
+
+    if analysis_cat == 'Good':
+        good_options = [
+            "Good explanation of biological concepts",
+            "Insightful analysis of different aspects of the question",
+            "Evidence is relevant to the question/claim",
+            "Profound summarization of the entire analysis",
+            "Others"
+        ]
+        analysis_detail = st.multiselect(
+            "Why was it good? (select all that apply)",
+            good_options,
+            default=[d for d in analysis_detail_default if d in good_options],
+            key=f"analysis_good_{row['QID']}_{idx+1}"
         )
-        # reset if category changes
-        if analysis_cat != analysis_cat_default:
-            analysis_detail_default = []
-            analysis_other_default = ""
-
-        if analysis_cat == 'Good':
-            good_options = [
-                "Good explanation of biological concepts",
-                "Insightful analysis of different aspects of the question",
-                "Evidence is relevant to the question/claim",
-                "Profound summarization of the entire analysis",
-                "Others"
-            ]
-            analysis_detail = st.multiselect(
-                "Why was it good? (select all that apply)",
-                good_options,
-                default=[d for d in analysis_detail_default if d in good_options],
-                key=f"analysis_good_{row['QID']}_{idx+1}"
+        if "Others" in analysis_detail:
+            analysis_other_explain = st.text_area(
+                "Please explain why choose 'Others':",
+                value=analysis_other_default,
+                key=f"analysis_good_other_{row['QID']}_{idx+1}"
             )
-            if "Others" in analysis_detail:
-                analysis_other_explain = st.text_area(
-                    "Please explain why choose 'Others':",
-                    value=analysis_other_default,
-                    key=f"analysis_good_other_{row['QID']}_{idx+1}"
-                )
-            else:
-                analysis_other_explain = None
-
-        elif analysis_cat == "Average":
-            avg_options = [
-                "Broad explanation of biological concepts",
-                "Straightforward analysis of the question",
-                "Evidence is partially relevant to the question/claim",
-                "Reasonable summarization of the analysis",
-                "Others"
-            ]
-            analysis_detail = st.multiselect(
-                "Why was it average? (select all that apply)",
-                avg_options,
-                default=[d for d in analysis_detail_default if d in avg_options],
-                key=f"analysis_general_{row['QID']}_{idx+1}"
+        else:
+            analysis_other_explain = None
+
+    elif analysis_cat == "Average":
+        avg_options = [
+            "Broad explanation of biological concepts",
+            "Straightforward analysis of the question",
+            "Evidence is partially relevant to the question/claim",
+            "Reasonable summarization of the analysis",
+            "Others"
+        ]
+        analysis_detail = st.multiselect(
+            "Why was it average? (select all that apply)",
+            avg_options,
+            default=[d for d in analysis_detail_default if d in avg_options],
+            key=f"analysis_general_{row['QID']}_{idx+1}"
+        )
+        if "Others" in analysis_detail:
+            analysis_other_explain = st.text_area(
+                "Please explain why choose 'Others':",
+                value=analysis_other_default,
+                key=f"analysis_average_other_{row['QID']}_{idx+1}"
             )
-            if "Others" in analysis_detail:
-                analysis_other_explain = st.text_area(
-                    "Please explain why choose 'Others':",
-                    value=analysis_other_default,
-                    key=f"analysis_average_other_{row['QID']}_{idx+1}"
-                )
-            else:
-                analysis_other_explain = None
-
-        elif analysis_cat == "Bad":
-            bad_options = [
-                "No or poor explanation of biological concepts",
-                "Shallow or overly brief analysis of the question",
-                "Evidence is not relevant to the question/claim",
-                "Missing or superficial summarization of the analysis",
-                "Others"
-            ]
-            analysis_detail = st.multiselect(
-                "Why was it bad? (select all that apply)",
-                bad_options,
-                default=[d for d in analysis_detail_default if d in bad_options],
-                key=f"analysis_bad_{row['QID']}_{idx+1}"
+        else:
+            analysis_other_explain = None
+
+    elif analysis_cat == "Bad":
+        bad_options = [
+            "No or poor explanation of biological concepts",
+            "Shallow or overly brief analysis of the question",
+            "Evidence is not relevant to the question/claim",
+            "Missing or superficial summarization of the analysis",
+            "Others"
+        ]
+        analysis_detail = st.multiselect(
+            "Why was it bad? (select all that apply)",
+            bad_options,
+            default=[d for d in analysis_detail_default if d in bad_options],
+            key=f"analysis_bad_{row['QID']}_{idx+1}"
+        )
+        if "Others" in analysis_detail:
+            analysis_other_explain = st.text_area(
+                "Please explain why choose 'Others':",
+                value=analysis_other_default,
+                key=f"analysis_bad_other_{row['QID']}_{idx+1}"
             )
-            if "Others" in analysis_detail:
-                analysis_other_explain = st.text_area(
-                    "Please explain why choose 'Others':",
-                    value=analysis_other_default,
-                    key=f"analysis_bad_other_{row['QID']}_{idx+1}"
-                )
-            else:
-                analysis_other_explain = None
         else:
-            analysis_detail = []
+            analysis_other_explain = None
+    else:
+        analysis_detail = []
 
-        other_comments = st.text_area(
-            "Is there any additional feedback you would like to give?",
-            value=other_comments_default,
-            key=f"feedback_{row['QID']}_{idx+1}",
-            height=80
-        )
+    other_comments = st.text_area(
+        "Is there any additional feedback you would like to give?",
+        value=other_comments_default,
+        key=f"feedback_{row['QID']}_{idx+1}",
+        height=80
+    )
 
-        cols = st.columns([1, 1, 1, 1, 1, 1, 1, 1])
-        with cols[0]:
-            if st.button("Back") and idx > 0:
-                st.session_state.answer_idx -= 1
-                st.rerun()
-        with cols[7]:
-            if st.button("Next"): 
-                valid = True
-                error_msgs = []
+    cols = st.columns([1, 1, 1, 1, 1, 1, 1, 1])
+    with cols[0]:
+        if st.button("Back") and idx > 0:
+            st.session_state.answer_idx -= 1
+            st.rerun()
+    with cols[7]:
+        if st.button("Next"): 
+            valid = True
+            error_msgs = []
+
+            if "Others" in analysis_detail and (not analysis_other_explain or not analysis_other_explain.strip()):
+                valid = False
+                error_msgs.append("Please provide an explanation for 'Others' in analysis detail.")
+
+            if not valid:
+                for msg in error_msgs:
+                    st.error(msg)
+            else:
+                end_time = time.time()
+                time_spent = end_time - st.session_state.start_time
+                st.session_state.start_time = time.time()
+                save_draft({f"Answer{idx+1}": {
+                    "accuracy": {
+                        "rating": accuracy,
+                        "explanation": accuracy_explain
+                    },
+                    "comprehension": comp,
+                    "novelty": novel, 
+                    "analysis_logic": {
+                        "category": analysis_cat,
+                        "details": analysis_detail, 
+                        "others_explanation": analysis_other_explain
+                    },
+                    "feedback": other_comments,
+                    "time_spent_sec": round(time_spent, 2)
+                }})
+                if idx < 3: 
+                    st.session_state.answer_idx += 1
+                    st.rerun() 
+                else: 
+                    st.session_state.answer_idx = 4
+                    st.rerun()
+    progress_fraction = (idx + 1) / MAX_ANSWER
+    st.markdown("---")
+    st.progress(progress_fraction)
+    st.caption(f"Answer {idx+1} of 4")
 
-                if "Others" in analysis_detail and (not analysis_other_explain or not analysis_other_explain.strip()):
-                    valid = False
-                    error_msgs.append("Please provide an explanation for 'Others' in analysis detail.")
 
-                if not valid:
-                    for msg in error_msgs:
-                        st.error(msg)
-                else:
-                    end_time = time.time()
-                    time_spent = end_time - st.session_state.start_time
-                    st.session_state.start_time = time.time()
-                    st.session_state.current_responses[f"Answer{idx+1}"] = {
-                        "accuracy": {
-                            "rating": accuracy,
-                            "explanation": accuracy_explain
-                        },
-                        "comprehension": comp,
-                        "novelty": novel, 
-                        "analysis_logic": {
-                            "category": analysis_cat,
-                            "details": analysis_detail, 
-                            "others_explanation": analysis_other_explain
-                        },
-                        "feedback": other_comments,
-                        "time_spent_sec": round(time_spent, 2)
-                    }
-                    if idx < 3: 
-                        st.session_state.answer_idx += 1
-                        st.rerun() 
-                    else: 
-                        st.session_state.answer_idx = 4
-                        st.rerun()
-        progress_fraction = (idx + 1) / MAX_ANSWER
-        st.markdown("---")
-        st.progress(progress_fraction)
-        st.caption(f"Answer {idx+1} of 4")
+@st.fragment
+def reference_form(row):
+    st.markdown("### 📚 Reference Evaluation")
+    st.markdown("Please rate the quality of each reference and then select your preferred one.")
 
-    # show reference page as last page
-    if idx == 4:
-        st.markdown("### 📚 Reference Evaluation")
-        st.markdown("Please rate the quality of each reference and then select your preferred one.")
+    # ALWAYS define these at the top of this block
+    saved_refs = st.session_state.current_responses.get("reference_ratings", {}) or {}
+    saved_pref = st.session_state.current_responses.get("preferred_reference")
 
-        # ALWAYS define these at the top of this block
-        saved_refs = st.session_state.current_responses.get("reference_ratings", {}) or {}
-        saved_pref = st.session_state.current_responses.get("preferred_reference")
+    reference_ratings = {}
 
-        reference_ratings = {}
+    for i in range(1, 5):
+        ref_key = f"Reference{i}"
 
-        for i in range(1, 5):
-            ref_key = f"Reference{i}"
+        st.markdown(f"#### Reference {i}")
+        with st.expander(f"📚 Reference {i} Content"):
+            st.markdown(row["linked_refs"][ref_key])
 
-            st.markdown(f"#### Reference {i}")
-            with st.expander(f"📚 Reference {i} Content"):
-                st.markdown(linkify_urls(row[ref_key]))
+        rating_key = f"ref_rating_{row['QID']}_{i}"
+        comment_key = f"ref_comment_{row['QID']}_{i}"
 
-            rating_key = f"ref_rating_{row['QID']}_{i}"
-            comment_key = f"ref_comment_{row['QID']}_{i}"
+        # pull any previously saved rating/comment
+        saved_rating = saved_refs.get(ref_key, {}).get("rating")
+        saved_comment = saved_refs.get(ref_key, {}).get("comment", "")
 
-            # pull any previously saved rating/comment
-            saved_rating = saved_refs.get(ref_key, {}).get("rating")
-            saved_comment = saved_refs.get(ref_key, {}).get("comment", "")
+        rating_index = (
+            ["Good", "Average", "Bad"].index(saved_rating)
+            if saved_rating in ["Good", "Average", "Bad"]
+            else None
+        )
 
-            rating_index = (
-                ["Good", "Average", "Bad"].index(saved_rating)
-                if saved_rating in ["Good", "Average", "Bad"]
-                else None
-            )
+        rating = st.radio(
+            f"How relevant was Reference {i} to the question/claim?",
+            ["Good", "Average", "Bad"],
+            index=rating_index,
+            key=rating_key,
+        )
 
-            rating = st.radio(
-                f"How relevant was Reference {i} to the question/claim?",
-                ["Good", "Average", "Bad"],
-                index=rating_index,
-                key=rating_key,
+        # clear comment if user changes choice
+        prev_rating_key = f"prev_rating_{row['QID']}_{i}"
+        if prev_rating_key not in st.session_state:
+            st.session_state[prev_rating_key] = saved_rating
+
+        if rating != st.session_state[prev_rating_key]:
+            if comment_key in st.session_state:
+                st.session_state[comment_key] = ""
+
+        st.session_state[prev_rating_key] = rating
+        # require comment if not good
+        if rating in ["Average", "Bad"]:
+            comment = st.text_area(
+                f"Please explain why Reference {i} was {rating.lower()} (optional)",
+                value=saved_comment,
+                key=comment_key,
+                height=80,
             )
+        else:
+            comment = ""
 
-            # clear comment if user changes choice
-            prev_rating_key = f"prev_rating_{row['QID']}_{i}"
-            if prev_rating_key not in st.session_state:
-                st.session_state[prev_rating_key] = saved_rating
-
-            if rating != st.session_state[prev_rating_key]:
-                if comment_key in st.session_state:
-                    st.session_state[comment_key] = ""
-
-            st.session_state[prev_rating_key] = rating
-            # require comment if not good
-            if rating in ["Average", "Bad"]:
-                comment = st.text_area(
-                    f"Please explain why Reference {i} was {rating.lower()} (optional)",
-                    value=saved_comment,
-                    key=comment_key,
-                    height=80,
-                )
-            else:
-                comment = ""
+        reference_ratings[ref_key] = {
+            "rating": rating,
+            "comment": comment,
+        }
 
-            reference_ratings[ref_key] = {
-                "rating": rating,
-                "comment": comment,
-            }
+        st.markdown("---")
 
-            st.markdown("---")
+    # preferred reference
+    options_pref = ["Reference 1", "Reference 2", "Reference 3", "Reference 4"]
+    pref_index = options_pref.index(saved_pref) if saved_pref in options_pref else None
 
-        # preferred reference
-        options_pref = ["Reference 1", "Reference 2", "Reference 3", "Reference 4"]
-        pref_index = options_pref.index(saved_pref) if saved_pref in options_pref else None
+    preferred = st.radio(
+        "Which reference do you prefer overall?",
+        options_pref,
+        index=pref_index,
+        key=f"preferred_{row['QID']}",
+    )
 
-        preferred = st.radio(
-            "Which reference do you prefer overall?",
-            options_pref,
-            index=pref_index,
-            key=f"preferred_{row['QID']}",
-        )
+    cols = st.columns([1, 1, 1, 1, 1, 1, 1, 1])
+    with cols[0]:
+        if st.button("Back"):
+            new_refs = {}
+            for i in range(1, 5):
+                ref_key = f"Reference{i}"
+                rating_key = f"ref_rating_{row['QID']}_{i}"
+                comment_key = f"ref_comment_{row['QID']}_{i}"
 
-        cols = st.columns([1, 1, 1, 1, 1, 1, 1, 1])
-        with cols[0]:
-            if st.button("Back"):
-                new_refs = {}
-                for i in range(1, 5):
-                    ref_key = f"Reference{i}"
-                    rating_key = f"ref_rating_{row['QID']}_{i}"
-                    comment_key = f"ref_comment_{row['QID']}_{i}"
-
-                    new_refs[ref_key] = {
-                        "rating": st.session_state.get(rating_key),
-                        "comment": st.session_state.get(comment_key, ""),
-                    }
-
-                st.session_state.current_responses["reference_ratings"] = new_refs
-                st.session_state.current_responses["preferred_reference"] = st.session_state.get(
-                    f"preferred_{row['QID']}"
-                )
-
-                st.session_state.answer_idx = 3
-                st.rerun()
+                new_refs[ref_key] = {
+                    "rating": st.session_state.get(rating_key),
+                    "comment": st.session_state.get(comment_key, ""),
+                }
+
+            save_draft({
+                "reference_ratings": new_refs,
+                "preferred_reference": st.session_state.get(f"preferred_{row['QID']}"),
+            })
 
+            st.session_state.answer_idx = 3
+            st.rerun()
 
-        with cols[7]:
-            if st.button("Next"):
-                valid = True
-                errors = []
 
-                # Validate all reference ratings
-                for i in range(1, 5):
-                    r = reference_ratings[f"Reference{i}"]["rating"]
-                    c = reference_ratings[f"Reference{i}"]["comment"]
+    with cols[7]:
+        if st.button("Next"):
+            valid = True
+            errors = []
 
-                    if r is None:
-                        valid = False
-                        errors.append(f"Please rate Reference {i}.")
+            # Validate all reference ratings
+            for i in range(1, 5):
+                r = reference_ratings[f"Reference{i}"]["rating"]
+                c = reference_ratings[f"Reference{i}"]["comment"]
 
-                if preferred is None:
+                if r is None:
                     valid = False
-                    errors.append("Please select your preferred reference.")
+                    errors.append(f"Please rate Reference {i}.")
 
-                if not valid:
-                    for msg in errors:
-                        st.error(msg)
-                else:
-                    # Save to session state
-                    st.session_state.current_responses["reference_ratings"] = reference_ratings
-                    st.session_state.current_responses["preferred_reference"] = preferred
+            if preferred is None:
+                valid = False
+                errors.append("Please select your preferred reference.")
 
-                    st.session_state.answer_idx = 5
-                    st.rerun()
+            if not valid:
+                for msg in errors:
+                    st.error(msg)
+            else:
+                # Save to session state
+                save_draft({
+                    "reference_ratings": reference_ratings,
+                    "preferred_reference": preferred,
+                })
 
-    if idx == 5:
-        st.markdown("### Select the Best Answers")
-        st.markdown("You have reviewed all answers. Please select which answers you felt were the best.")
-
-        # Summary of previous ratings
-        st.markdown("#### Your Ratings Summary")
-        responses = st.session_state.current_responses
-        for i in range(1, 5):
-            ans_data = responses.get(f"Answer{i}", {})
-            acc = ans_data.get("accuracy", {}).get("rating", "—")
-            comp = ans_data.get("comprehension", "—")
-            novel = ans_data.get("novelty", "—")
-            analysis = ans_data.get("analysis_logic", {}).get("category", "—")
-            with st.expander(f"Answer {i} — Accuracy: {acc} | Comprehension: {comp}/5 | Novelty: {novel} | Analysis: {analysis}"):
-                st.write(row[f"Answer{i}"])
-
-        ref_ratings = responses.get("reference_ratings", {})
-        pref_ref = responses.get("preferred_reference", "—")
-        ref_summary_parts = []
-        for i in range(1, 5):
-            r = ref_ratings.get(f"Reference{i}", {}).get("rating", "—")
-            ref_summary_parts.append(f"Ref {i}: {r}")
-        st.markdown(f"**References:** {' | '.join(ref_summary_parts)} | Preferred: {pref_ref}")
+                st.session_state.answer_idx = 5
+                st.rerun()
 
-        st.markdown("---")
-        saved_best = st.session_state.current_responses.get("best_answers", [])
-        best_answers_selected = st.multiselect(
-            "Which answers were the best? (Select all that applies)",
-            ["Answer 1", "Answer 2", "Answer 3", "Answer 4"],
-            default=saved_best,
-            key=f"best_answers_{row['QID']}"
-        )
 
-        cols = st.columns([1, 1, 1, 1, 1, 1, 1])
-        with cols[0]:
-            if st.button("Back", key=f"final_back_{row['QID']}"):
+@st.fragment
+def best_answer_form(row):
+    st.markdown("### Select the Best Answers")
+    st.markdown("You have reviewed all answers. Please select which answers you felt were the best.")
+
+    # Summary of previous ratings
+    st.markdown("#### Your Ratings Summary")
+    responses = st.session_state.current_responses
+    for i in range(1, 5):
+        ans_data = responses.get(f"Answer{i}", {})
+        acc = ans_data.get("accuracy", {}).get("rating", "—")
+        comp = ans_data.get("comprehension", "—")
+        novel = ans_data.get("novelty", "—")
+        analysis = ans_data.get("analysis_logic", {}).get("category", "—")
+        with st.expander(f"Answer {i} — Accuracy: {acc} | Comprehension: {comp}/5 | Novelty: {novel} | Analysis: {analysis}"):
+            st.write(row[f"Answer{i}"])
+
+    ref_ratings = responses.get("reference_ratings", {})
+    pref_ref = responses.get("preferred_reference", "—")
+    ref_summary_parts = []
+    for i in range(1, 5):
+        r = ref_ratings.get(f"Reference{i}", {}).get("rating", "—")
+        ref_summary_parts.append(f"Ref {i}: {r}")
+    st.markdown(f"**References:** {' | '.join(ref_summary_parts)} | Preferred: {pref_ref}")
+
+    st.markdown("---")
+    saved_best = st.session_state.current_responses.get("best_answers", [])
+    best_answers_selected = st.multiselect(
+        "Which answers were the best? (Select all that applies)",
+        ["Answer 1", "Answer 2", "Answer 3", "Answer 4"],
+        default=saved_best,
+        key=f"best_answers_{row['QID']}"
+    )
+
+    cols = st.columns([1, 1, 1, 1, 1, 1, 1])
+    with cols[0]:
+        if st.button("Back", key=f"final_back_{row['QID']}"):
+            save_draft({"best_answers": best_answers_selected})
+            st.session_state.answer_idx = 4
+            st.rerun()
+    
+    with cols[6]:
+        is_edit = int(row["QID"]) in completed_qids
+        submit_label = "Save Edit" if is_edit else "Submit"
+        if st.button(submit_label):
+            if not best_answers_selected:
+                st.error("Please select at least one answer before submitting.")
+            else:
                 st.session_state.current_responses["best_answers"] = best_answers_selected
-                st.session_state.answer_idx = 4
-                st.rerun()
-        
-        with cols[6]:
-            is_edit = int(row["QID"]) in completed_qids
-            submit_label = "Save Edit" if is_edit else "Submit"
-            if st.button(submit_label):
-                if not best_answers_selected:
-                    st.error("Please select at least one answer before submitting.")
+                doc = {
+                    "email": user_email,
+                    "qid": int(row["QID"]),
+                    "responses": st.session_state.current_responses,
+                    "timestamp": datetime.datetime.utcnow()
+                }
+                saved_responses[doc["qid"]] = doc["responses"]
+                draft_store.discard(user_email, doc["qid"])
+                drafts.pop(doc["qid"], None)
+                # queued for a background write so Mongo latency never blocks the page
+                if is_edit:
+                    write_id = writer.submit(edits_collection.name, doc)
+                    st.success("Edit saved!")
                 else:
-                    st.session_state.current_responses["best_answers"] = best_answers_selected
-                    doc = {
-                        "email": user_email,
-                        "qid": int(row["QID"]),
-                        "responses": st.session_state.current_responses,
-                        "timestamp": datetime.datetime.utcnow()
-                    }
-                    if is_edit:
-                        edits_collection.insert_one(doc)
-                        st.success("Edit saved!")
-                    else:
-                        responses_collection.insert_one(doc)
-                        st.success("Response submitted!")
-                    st.session_state.answer_idx = 0
-                    st.session_state.current_responses = {}
-                    go_to_next_uncompleted()
-                    st.rerun()
+                    write_id = writer.submit(responses_collection.name, doc)
+                    completed_qids.add(doc["qid"])
+                    st.success("Response submitted!")
+                st.session_state.pending_writes.append(write_id)
+                st.session_state.answer_idx = 0
+                st.session_state.current_responses = {}
+                go_to_next_uncompleted()
+                st.rerun()
+
+
+# Display
+if not uncompleted_qids:
+    st.info("You've completed all annotations. You may review and edit your previous responses.")
+
+if st.session_state.current_qid is not None:
+    with profiling.phase("question_load"):
+        row = load_question(st.session_state.current_qid)
+    st.markdown("### 📌 Topic")
+    st.info(row['Qtopic'])
+    with st.expander("❓ Question"):
+        st.write(row['Question'])
+    
+    if "answer_idx" not in st.session_state:
+        st.session_state.answer_idx = 0
+    if "current_responses" not in st.session_state:
+        st.session_state.current_responses = {}
+
+    idx = st.session_state.answer_idx
+
+    with profiling.phase("render_form"):
+        # Only show answers when idx is less than 4
+        if idx < 4:
+            answer_form(row, idx)
+
+        # show reference page as last page
+        if idx == 4:
+            reference_form(row)
+
+        if idx == 5:
+            # warm the question Submit will move to while the user picks the best answers
+            current = int(st.session_state.current_qid)
+            next_qid = next_uncompleted_qid(completed_qids | {current})
+            if next_qid != current:
+                prefetcher.start(st.session_state, next_qid, prefetch_question, next_qid)
+            best_answer_form(row)
 
+profiling.finish_rerun(st.session_state)
@@ -0,0 +1,63 @@
+import streamlit as st
+
+from admin import is_admin
+from study_progress import (
+    PROGRESS_TTL_SEC,
+    SETTLE_SEC,
+    assigned_counts,
+    get_study_progress,
+    summarize,
+)
+
+# remove the pages sidebar
+st.markdown("""
+<style>
+[data-testid="stSidebarNav"] {
+    display: none !important;
+}
+</style>
+""", unsafe_allow_html=True)
+
+if "logged_in" not in st.session_state or not st.session_state.logged_in:
+    st.error("Please log in the first page.")
+    st.switch_page("app.py")
+
+if not is_admin(st.session_state.user_email):
+    st.error("This page is only available to study coordinators.")
+    st.stop()
+
+st.sidebar.page_link("pages/annotation.py", label="⬅️ Back to annotation")
+
+st.title("📊 Study Progress")
+st.caption(
+    f"Updated every {PROGRESS_TTL_SEC} seconds. "
+    f"Submissions appear {SETTLE_SEC} seconds after they are saved."
+)
+
+study_progress = get_study_progress()
+if st.button("Recompute from scratch"):
+    study_progress.rebuild()
+
+progress = study_progress.get()
+assigned = assigned_counts()
+by_annotator = summarize(progress, assigned, "email")
+by_topic = summarize(progress, assigned, "Qtopic")
+
+total_assigned = int(by_annotator["assigned"].sum())
+total_completed = int(by_annotator["completed"].sum())
+col1, col2, col3 = st.columns(3)
+col1.metric("Completed", f"{total_completed} / {total_assigned}")
+col2.metric("Edits", int(by_annotator["edits"].sum()))
+col3.metric("Active annotators", int((by_annotator["completed"] > 0).sum()))
+st.progress(total_completed / total_assigned if total_assigned else 0)
+
+column_config = {
+    "completion": st.column_config.ProgressColumn("completion", min_value=0, max_value=1, format="%.2f"),
+    "median_time_sec": st.column_config.NumberColumn("median time (s)"),
+}
+
+st.markdown("### By annotator")
+st.dataframe(by_annotator, column_config=column_config)
+
+st.markdown("### By topic")
+st.dataframe(by_topic, column_config=column_config)
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# Threads shared by all sessions; a prefetch is a few dict lookups or one find_one
+PREFETCH_WORKERS = 4
+
+
+class Prefetcher:
+    """Loads the question a session is expected to open next on a worker thread.
+
+    Each session holds at most one prefetch, stored in its session_state as
+    (key, future). The next rerun takes the result if the key matches, so
+    the transition is served from memory instead of waiting on Mongo.
+    """
+
+    def __init__(self, workers=PREFETCH_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+
+    def start(self, session_state, key, fn, *args):
+        pending = session_state.get("prefetch")
+        if pending is not None and pending[0] == key:
+            return
+        session_state.prefetch = (key, self._pool.submit(fn, *args))
+
+    def take(self, session_state, key):
+        """Result of the prefetch for key, or None if there is none or it failed."""
+        pending = session_state.pop("prefetch", None)
+        if pending is None or pending[0] != key:
+            return None
+        try:
+            # usually done already; if not, waiting beats starting over
+            return pending[1].result()
+        except Exception:
+            return None
+
+    def cancel(self, session_state):
+        pending = session_state.pop("prefetch", None)
+        if pending is not None:
+            pending[1].cancel()
+
+
+@st.cache_resource
+def get_prefetcher():
+    return Prefetcher()
@@ -0,0 +1,164 @@
+import collections
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import uuid
+
+import bson
+from pymongo import monitoring
+
+# Opt in with EVIBENCH_PROFILE=1; everything here is a no-op otherwise
+ENABLED = os.environ.get("EVIBENCH_PROFILE") == "1"
+LOG_PATH = os.path.join("logs", "reruns.jsonl")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+# Finished reruns kept in memory for the debug panel
+RECENT_RERUNS = 500
+
+recent = collections.deque(maxlen=RECENT_RERUNS)
+_active = {}  # thread id -> profile of the rerun running on that thread
+_lock = threading.Lock()
+_logger = None
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("evibench.reruns")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+class RerunProfile:
+    def __init__(self, page, session_id, user):
+        self.page = page
+        self.session_id = session_id
+        self.user = user
+        self.started = time.time()
+        self.ended = self.started
+        self.phases = {}
+        self.commands = {}
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self.ended = time.time()
+
+    def add_command(self, name, seconds, request_bytes, reply_bytes):
+        stats = self.commands.setdefault(name, {"count": 0, "ms": 0.0, "bytes_out": 0, "bytes_in": 0})
+        stats["count"] += 1
+        stats["ms"] += seconds * 1000
+        stats["bytes_out"] += request_bytes
+        stats["bytes_in"] += reply_bytes
+
+    def to_record(self, completed):
+        return {
+            "ts": self.started,
+            "page": self.page,
+            "session": self.session_id,
+            "user": self.user,
+            # a rerun cut short by st.rerun()/switch_page ends at its last phase
+            "completed": completed,
+            "total_ms": round((self.ended - self.started) * 1000, 2),
+            "phases_ms": {k: round(v * 1000, 2) for k, v in self.phases.items()},
+            "round_trips": sum(c["count"] for c in self.commands.values()),
+            "commands": self.commands,
+        }
+
+
+def start_rerun(session_state, page, user=None):
+    """Begin profiling the current rerun, closing out the previous one."""
+    if not ENABLED:
+        return
+    previous = session_state.get("_rerun_profile")
+    if previous is not None:
+        _finish(previous, completed=False)
+    session_id = session_state.setdefault("_profile_session", uuid.uuid4().hex[:8])
+    profile = RerunProfile(page, session_id, user)
+    session_state["_rerun_profile"] = profile
+    with _lock:
+        _active[threading.get_ident()] = profile
+
+
+def finish_rerun(session_state):
+    if not ENABLED:
+        return
+    profile = session_state.pop("_rerun_profile", None)
+    if profile is not None:
+        profile.ended = time.time()
+        _finish(profile, completed=True)
+
+
+def worst_sessions(limit=10):
+    """Sessions in the recent reruns ordered by their slowest rerun."""
+    sessions = {}
+    for record in list(recent):
+        stats = sessions.setdefault(record["session"], {
+            "session": record["session"], "user": record["user"],
+            "reruns": 0, "max_ms": 0.0, "total_ms": 0.0, "round_trips": 0,
+        })
+        stats["reruns"] += 1
+        stats["max_ms"] = max(stats["max_ms"], record["total_ms"])
+        stats["total_ms"] += record["total_ms"]
+        stats["round_trips"] += record["round_trips"]
+    return sorted(sessions.values(), key=lambda s: s["max_ms"], reverse=True)[:limit]
+
+
+def _finish(profile, completed):
+    with _lock:
+        for ident, active in list(_active.items()):
+            if active is profile:
+                del _active[ident]
+    record = profile.to_record(completed)
+    recent.append(record)
+    _get_logger().info(json.dumps(record, default=str))
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Time a block of the current rerun under name."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile = _active.get(threading.get_ident())
+        if profile is not None:
+            profile.add_phase(name, time.perf_counter() - start)
+
+
+class CommandProfiler(monitoring.CommandListener):
+    """Attributes each Mongo command to the rerun running on its thread."""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        if threading.get_ident() in _active:
+            self._pending[event.request_id] = len(bson.encode(event.command))
+
+    def succeeded(self, event):
+        self._record(event, len(bson.encode(event.reply)))
+
+    def failed(self, event):
+        self._record(event, 0)
+
+    def _record(self, event, reply_bytes):
+        request_bytes = self._pending.pop(event.request_id, None)
+        profile = _active.get(threading.get_ident())
+        if request_bytes is None or profile is None:
+            return
+        profile.add_command(event.command_name, event.duration_micros / 1e6, request_bytes, reply_bytes)
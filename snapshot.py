@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Local copy of the normalized evibench table, tagged with its revision
+SNAPSHOT_PATH = os.path.join("snapshot", "evibench.parquet")
+
+
+def read_snapshot(path=SNAPSHOT_PATH, columns=None):
+    """Return (frame, revision) from the snapshot, or (None, None) if there is none."""
+    if not os.path.exists(path):
+        return None, None
+    try:
+        table = pq.read_table(path, columns=columns)
+    except (OSError, pa.ArrowInvalid):
+        return None, None  # unreadable file; fall back to Mongo
+    revision = int((table.schema.metadata or {}).get(b"revision", b"0"))
+    return table.to_pandas(), revision
+
+
+def snapshot_revision(path=SNAPSHOT_PATH):
+    """Revision of the snapshot without reading its data, or None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return int(metadata.get(b"revision", b"0"))
+
+
+def write_snapshot(df, revision, path=SNAPSHOT_PATH):
+    """Atomically replace the snapshot with df at revision."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"revision"] = str(revision).encode()
+    table = table.replace_schema_metadata(metadata)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+# Uncompressed Arrow IPC copy of the same table that workers memory-map
+CORPUS_PATH = os.path.join("snapshot", "evibench.arrow")
+# How often a worker checks whether a new corpus file was swapped in
+REMAP_CHECK_SEC = 5
+
+
+def write_corpus(df, revision, path=CORPUS_PATH):
+    """Atomically replace the shared corpus file with df at revision."""
+    table = pa.Table.from_pandas(df.sort_values("QID"), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"revision"] = str(revision).encode()
+    table = table.replace_schema_metadata(metadata)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    # workers that mapped the old file keep reading it until they remap
+    os.replace(tmp_path, path)
+
+
+def corpus_revision(path=CORPUS_PATH):
+    if not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path, "r") as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return int(metadata.get(b"revision", b"0"))
+
+
+class SharedCorpus:
+    """Read-only view of the corpus file, memory-mapped rather than copied.
+
+    Every worker on a host maps the same file, so the text is held once by
+    the OS page cache. Rows are sliced per QID and only the requested row
+    is turned into Python objects.
+    """
+
+    def __init__(self, path=CORPUS_PATH):
+        self.path = path
+        self.table = None
+        self.revision = None
+        self._rows = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def row(self, qid):
+        """(row dict, corpus revision) for qid, or (None, None) if not in the file."""
+        self._maybe_remap()
+        table, rows, revision = self.table, self._rows, self.revision
+        pos = rows.get(qid)
+        if pos is None:
+            return None, None
+        return table.slice(pos, 1).to_pylist()[0], revision
+
+    def _maybe_remap(self):
+        now = time.monotonic()
+        if now - self._checked_at < REMAP_CHECK_SEC:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                source = pa.memory_map(self.path, "r")
+                table = pa.ipc.open_file(source).read_all()
+            except (OSError, pa.ArrowInvalid):
+                return
+            rows = {}
+            for pos, qid in enumerate(table.column("QID").to_pylist()):
+                rows.setdefault(qid, pos)
+            revision = int((table.schema.metadata or {}).get(b"revision", b"0"))
+            # swap all three at once; readers grab them together
+            self.table, self._rows, self.revision = table, rows, revision
+            self._mtime = mtime
@@ -0,0 +1,142 @@
+import datetime
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from corpus import load_evibench_meta
+from db import EDITS, get_evibench, get_responses, written_between
+
+# Viewers within this window share one aggregation
+PROGRESS_TTL_SEC = 30
+# Windows end this far in the past; written_at comes from the database
+# server's clock, which may run ahead of this host's
+SETTLE_SEC = 60
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def progress_pipeline(since, until):
+    """Per (email, Qtopic) submissions, edits and time spent written in (since, until].
+
+    Runs on responses_2 and pulls in response_edits with $unionWith and the
+    topic from evibench with $lookup (MongoDB 5.0+).
+    """
+    window = {"$match": written_between(since, until)}
+    time_spent = {"$add": [
+        {"$ifNull": [f"$responses.Answer{i}.time_spent_sec", 0]} for i in range(1, 5)
+    ]}
+    return [
+        window,
+        {"$project": {
+            "_id": 0, "email": 1, "qid": 1, "timestamp": 1,
+            "kind": {"$literal": "response"}, "time_spent": time_spent,
+        }},
+        {"$unionWith": {"coll": EDITS, "pipeline": [
+            window,
+            {"$project": {
+                "_id": 0, "email": 1, "qid": 1, "timestamp": 1,
+                "kind": {"$literal": "edit"},
+            }},
+        ]}},
+        {"$lookup": {
+            "from": get_evibench().name,
+            "localField": "qid",
+            "foreignField": "QID",
+            "pipeline": [{"$project": {"_id": 0, "Qtopic": 1}}, {"$limit": 1}],
+            "as": "question",
+        }},
+        {"$group": {
+            "_id": {"email": "$email", "topic": {"$first": "$question.Qtopic"}},
+            "completed": {"$sum": {"$cond": [{"$eq": ["$kind", "response"]}, 1, 0]}},
+            "edits": {"$sum": {"$cond": [{"$eq": ["$kind", "edit"]}, 1, 0]}},
+            "times": {"$push": "$time_spent"},
+            "last_activity": {"$max": "$timestamp"},
+        }},
+    ]
+
+
+class StudyProgress:
+    """Completion, edit counts and time spent per annotator and topic.
+
+    Counts are kept per (email, Qtopic) and extended from the last
+    watermark on each refresh, so every aggregation only reads documents
+    written since the one before.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self.watermark = EPOCH
+        self.groups = {}
+
+    def get(self):
+        with self._lock:
+            if time.monotonic() - self._checked_at > PROGRESS_TTL_SEC:
+                self._refresh()
+                self._checked_at = time.monotonic()
+            return self.frame()
+
+    def rebuild(self):
+        with self._lock:
+            self.watermark = EPOCH
+            self.groups = {}
+            self._checked_at = 0.0
+
+    def _refresh(self):
+        until = datetime.datetime.utcnow() - datetime.timedelta(seconds=SETTLE_SEC)
+        for doc in get_responses().aggregate(progress_pipeline(self.watermark, until)):
+            key = (doc["_id"]["email"], doc["_id"].get("topic"))
+            group = self.groups.setdefault(
+                key, {"completed": 0, "edits": 0, "times": [], "last_activity": None}
+            )
+            group["completed"] += doc["completed"]
+            group["edits"] += doc["edits"]
+            # edits carry no time_spent and push nothing
+            group["times"].extend(t for t in doc["times"] if t is not None)
+            if group["last_activity"] is None or doc["last_activity"] > group["last_activity"]:
+                group["last_activity"] = doc["last_activity"]
+        self.watermark = until
+
+    def frame(self):
+        """One row per (email, topic) with the times still unreduced."""
+        return pd.DataFrame(
+            [{"email": email, "Qtopic": topic, **group} for (email, topic), group in self.groups.items()],
+            columns=["email", "Qtopic", "completed", "edits", "times", "last_activity"],
+        )
+
+
+@st.cache_resource
+def get_study_progress():
+    return StudyProgress()
+
+
+def assigned_counts():
+    """Assigned questions per (email, Qtopic) from the cached metadata."""
+    meta = load_evibench_meta()
+    meta = meta[meta["Email"].notna()]
+    # responses carry the stripped, lowercased login, like build_user_index
+    email = meta["Email"].astype(str).str.strip().str.lower().rename("email")
+    counts = meta.groupby([email, meta["Qtopic"]], observed=True).size()
+    return counts.rename("assigned").reset_index()
+
+
+def summarize(progress, assigned, by):
+    """Completion, edits and median time per `by` ("email" or "Qtopic")."""
+    merged = assigned.merge(progress, on=["email", "Qtopic"], how="outer")
+    merged["Qtopic"] = merged["Qtopic"].astype(object)
+    merged[["assigned", "completed", "edits"]] = merged[["assigned", "completed", "edits"]].fillna(0)
+    merged["times"] = merged["times"].apply(lambda t: t if isinstance(t, list) else [])
+    summary = merged.groupby(by, dropna=False).agg(
+        assigned=("assigned", "sum"),
+        completed=("completed", "sum"),
+        edits=("edits", "sum"),
+        times=("times", lambda col: [t for times in col for t in times]),
+        last_activity=("last_activity", "max"),
+    )
+    summary["completion"] = (summary["completed"] / summary["assigned"]).where(summary["assigned"] > 0)
+    summary["median_time_sec"] = summary.pop("times").apply(
+        lambda t: round(float(pd.Series(t).median()), 1) if t else None
+    )
+    summary = summary.astype({"assigned": int, "completed": int, "edits": int})
+    return summary.sort_values("completion")
@@ -1,43 +1,99 @@
+import argparse
+
 import pandas as pd
-import streamlit as st
-from pymongo import MongoClient
+from pymongo import UpdateOne
 
-# Read TSV, skip blank lines and repeated headers
-df = pd.read_csv("Double Annotation - 2round.tsv", sep="\t", encoding="utf-8")
-df = df.dropna(subset=["QID", "Question", "LoginName"])
-df = df[df["QID"] != "QID"]  # drop repeated header rows
+from corpus import CorpusBusyError, begin_revision, corpus_writer, publish_revision
+from db import get_evibench
 
-# Extract numeric QID from "QID:53" -> 53
-df["QID"] = df["QID"].str.replace("QID:", "", regex=False).astype(int)
+BATCH_SIZE = 1000
 
-# Strip whitespace from LoginName
-df["LoginName"] = df["LoginName"].str.strip()
 
-MONGO_URI = st.secrets["MONGO_URI"]
-client = MongoClient(MONGO_URI)
-db = client["database"]
-evibench_collection = db["evibench"]
+def load_assignments(path):
+    # Read TSV, skip blank lines and repeated headers
+    df = pd.read_csv(path, sep="\t", encoding="utf-8")
+    df = df.dropna(subset=["QID", "Question", "LoginName"])
+    df = df[df["QID"] != "QID"]  # drop repeated header rows
 
-updated = 0
-not_found = []
+    # Extract numeric QID from "QID:53" -> 53
+    df["QID"] = df["QID"].str.replace("QID:", "", regex=False).astype(int)
 
-for _, row in df.iterrows():
-    qid = row["QID"]
-    question = row["Question"]
-    login_name = row["LoginName"]
+    # Strip whitespace from LoginName
+    df["LoginName"] = df["LoginName"].str.strip()
+    return df
 
-    result = evibench_collection.update_one(
-        {"QID": qid, "Question": question},
-        {"$set": {"Email": login_name}}
-    )
 
-    if result.matched_count > 0:
-        updated += 1
-        print(f"  Updated QID {qid} -> Email: {login_name}")
-    else:
-        not_found.append(qid)
-        print(f"  NOT FOUND: QID {qid}")
+def resolve_matches(evibench_collection, df):
+    """Pick the evibench document each assignment goes to, in one query.
+
+    A double-annotated QID has one document per annotator. Rows whose
+    login already holds a copy of the question are left alone; the others
+    take the remaining copies in _id order, so re-running the same file
+    always targets the same documents. Returns (targets with an _id
+    column, already assigned rows, rows without a free matching document).
+    """
+    qids = [int(qid) for qid in df["QID"].unique()]
+    copies = {}
+    for doc in evibench_collection.find(
+        {"QID": {"$in": qids}}, {"QID": 1, "Question": 1, "Email": 1}
+    ).sort("_id", 1):
+        copies.setdefault((doc["QID"], doc.get("Question")), []).append(doc)
+
+    target_ids, assigned, missing = [], [], []
+    for (qid, question), rows in df.groupby(["QID", "Question"], sort=False):
+        docs = copies.get((qid, question), [])
+        holders = {doc.get("Email") for doc in docs}
+        logins = set(rows["LoginName"])
+        free = [doc for doc in docs if doc.get("Email") not in logins]
+        for index, login_name in zip(rows.index, rows["LoginName"]):
+            if login_name in holders:
+                assigned.append(index)
+            elif free:
+                target_ids.append((index, free.pop(0)["_id"]))
+                holders.add(login_name)
+            else:
+                missing.append(index)
+    targets = df.loc[[index for index, _ in target_ids]].assign(_id=[_id for _, _id in target_ids])
+    return targets, df.loc[assigned], df.loc[missing]
+
 
-print(f"\nDone. Updated: {updated}, Not found: {len(not_found)}")
-if not_found:
-    print(f"Missing QIDs: {not_found}")
+def apply_assignments(evibench_collection, targets, revision):
+    """Set Email on the resolved documents; returns how many changed."""
+    modified = 0
+    ops = [
+        UpdateOne({"_id": _id}, {"$set": {"Email": login_name, "_rev": revision}})
+        for _id, login_name in zip(targets["_id"], targets["LoginName"])
+    ]
+    for start in range(0, len(ops), BATCH_SIZE):
+        result = evibench_collection.bulk_write(ops[start:start + BATCH_SIZE], ordered=False)
+        modified += result.modified_count
+    return modified
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reassign evibench questions to annotators.")
+    parser.add_argument("path", nargs="?", default="Double Annotation - 2round.tsv")
+    parser.add_argument("--dry-run", action="store_true", help="only report which QIDs would be updated")
+    args = parser.parse_args()
+
+    evibench_collection = get_evibench()
+
+    df = load_assignments(args.path)
+    if args.dry_run:
+        targets, assigned, missing = resolve_matches(evibench_collection, df)
+        print(f"Dry run. Would update: {len(targets)}, Already assigned: {len(assigned)}, Not found: {len(missing)}")
+    else:
+        evibench_collection.create_index([("QID", 1), ("Email", 1)])
+        try:
+            with corpus_writer("update_annotations.py"):
+                targets, assigned, missing = resolve_matches(evibench_collection, df)
+                revision = begin_revision()
+                modified = apply_assignments(evibench_collection, targets, revision)
+                if modified:
+                    # running apps pick up the new assignments on their next check
+                    publish_revision(revision)
+        except CorpusBusyError as e:
+            raise SystemExit(f"Update failed: {e}")
+        print(f"Done. Updated: {modified}, Already assigned: {len(assigned)}, Not found: {len(missing)}")
+    if len(missing):
+        print(f"Missing QIDs: {missing['QID'].tolist()}")
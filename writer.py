@@ -0,0 +1,253 @@
+import collections
+import fcntl
+import glob
+import os
+import queue
+import threading
+import time
+
+import streamlit as st
+from bson import ObjectId, json_util
+from pymongo.errors import ConnectionFailure, DuplicateKeyError, OperationFailure, WriteConcernError
+
+from db import EDITS, LATEST, RESPONSES, get_db
+from edit_history import make_edit
+
+# Each process appends the submissions it has not yet seen confirmed by
+# Mongo to its own log in this directory, locked while the process lives
+SPOOL_DIR = "spool"
+SPOOL_PATTERN = "submissions*.jsonl"
+QUEUE_SIZE = 1000
+# Errors a later attempt can get past; any other error fails the write at once
+TRANSIENT_ERRORS = (ConnectionFailure, WriteConcernError)
+RETRY_BASE_SEC = 0.5
+RETRY_MAX_SEC = 30
+
+
+class SubmissionWriter:
+    """Writes submissions to Mongo on a background thread.
+
+    Every submission is appended to this process's JSONL spool before it
+    is queued and marked done once Mongo accepts it. A starting process
+    replays the unfinished writes of spools whose lock it can take, i.e.
+    of processes that have stopped. Submitting never blocks: replayed
+    entries, and new ones once the queue is full, wait in a backlog behind
+    the queue.
+    """
+
+    def __init__(self, db, spool_dir=SPOOL_DIR, maxsize=QUEUE_SIZE):
+        self.db = db
+        self.last_error = None
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._failed = {}
+        os.makedirs(spool_dir, exist_ok=True)
+        self.spool_path = os.path.join(spool_dir, f"submissions-{os.getpid()}-{ObjectId()}.jsonl")
+        # lock before the name matches SPOOL_PATTERN, so no other process
+        # ever takes this spool for an orphan
+        tmp_path = self.spool_path + ".tmp"
+        self._spool = open(tmp_path, "a", encoding="utf-8")
+        fcntl.flock(self._spool, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.rename(tmp_path, self.spool_path)
+        # everything in the backlog is newer than everything in the queue
+        self._backlog = collections.deque(self._adopt_orphans(spool_dir))
+        for entry in self._backlog:
+            self._pending[entry["id"]] = entry
+        self._thread = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, collection, doc):
+        """Spool and queue an insert of doc into collection; returns its write id."""
+        doc = dict(doc)
+        # a fixed _id makes retries of the same insert harmless
+        doc.setdefault("_id", ObjectId())
+        entry = {"id": str(doc["_id"]), "collection": collection, "doc": doc}
+        with self._lock:
+            self._append({"op": "write", **entry})
+            self._pending[entry["id"]] = entry
+            if self._backlog:
+                self._backlog.append(entry)
+            else:
+                try:
+                    self._queue.put_nowait(entry)
+                except queue.Full:
+                    self._backlog.append(entry)
+        return entry["id"]
+
+    def is_pending(self, write_id):
+        return write_id in self._pending
+
+    def failure(self, write_id):
+        """Error of a write that cannot be retried, or None."""
+        return self._failed.get(write_id)
+
+    def pending_docs(self, collection, email):
+        """Documents for this user still waiting to reach collection."""
+        with self._lock:
+            entries = list(self._pending.values())
+        return [
+            e["doc"] for e in entries
+            if e["collection"] == collection and e["doc"].get("email") == email
+        ]
+
+    def _next(self):
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._backlog:
+                return self._backlog.popleft()
+        # an empty queue never overflows, so new work arrives here
+        return self._queue.get()
+
+    def _run(self):
+        while True:
+            entry = self._next()
+            delay = RETRY_BASE_SEC
+            while True:
+                try:
+                    self._write(entry)
+                    break
+                except TRANSIENT_ERRORS as e:
+                    self.last_error = str(e)
+                    time.sleep(delay)
+                    delay = min(delay * 2, RETRY_MAX_SEC)
+                except Exception as e:
+                    # e.g. a validation or authorization failure; retrying would
+                    # stall every later write, so leave it in the spool for the
+                    # next start
+                    with self._lock:
+                        self._pending.pop(entry["id"], None)
+                        self._failed[entry["id"]] = str(e)
+                    entry = None
+                    break
+            if entry is None:
+                continue
+            with self._lock:
+                self._append({"op": "done", "id": entry["id"]})
+                self._pending.pop(entry["id"], None)
+            self.last_error = None
+
+    def _write(self, entry):
+        doc = dict(entry["doc"])
+        key = {"email": doc["email"], "qid": doc["qid"]}
+        version = 0
+        try:
+            if entry["collection"] == RESPONSES:
+                # first submission wins; a double submit collides with the
+                # unique (email, qid) index and is a no-op
+                self._insert_once(RESPONSES, doc)
+            elif entry["collection"] == EDITS:
+                # store the edit as a patch against the current latest version
+                prev = self.db[LATEST].find_one(key, {"responses": 1, "version": 1}) or {}
+                record = make_edit(doc, prev.get("responses"), prev.get("version", 0))
+                version = record["version"]
+                self._insert_once(EDITS, record)
+            else:
+                self._insert_once(entry["collection"], doc)
+        except DuplicateKeyError:
+            pass  # an earlier attempt already landed
+        if entry["collection"] in (RESPONSES, EDITS):
+            self._write_latest(key, doc, version)
+
+    def _insert_once(self, collection, doc):
+        """Insert doc stamped with the server's write time.
+
+        timestamp is when the user submitted, which a retried or replayed
+        write can land long after; readers that page through new documents
+        use written_at. A document that already landed keeps its stamp:
+        the filter no longer matches it and the upsert collides on _id.
+        """
+        fields = {k: v for k, v in doc.items() if k != "_id"}
+        self.db[collection].update_one(
+            {"_id": doc["_id"], "written_at": {"$exists": False}},
+            {"$setOnInsert": fields, "$currentDate": {"written_at": True}},
+            upsert=True,
+        )
+
+    def _write_latest(self, key, doc, version):
+        latest = {k: v for k, v in doc.items() if k != "_id"}
+        latest["version"] = version
+        try:
+            # only replace an older version; if a newer one exists the upsert
+            # collides with the unique index and is dropped
+            self.db[LATEST].update_one(
+                {**key, "timestamp": {"$lt": doc["timestamp"]}},
+                {"$set": latest, "$currentDate": {"written_at": True}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            pass
+
+    def _append(self, *records):
+        for record in records:
+            self._spool.write(json_util.dumps(record) + "\n")
+        self._spool.flush()
+        os.fsync(self._spool.fileno())
+
+    def _adopt_orphans(self, spool_dir):
+        """Move the unfinished writes of spools no live process holds into ours."""
+        pending = {}
+        for path in sorted(glob.glob(os.path.join(spool_dir, SPOOL_PATTERN))):
+            if path == self.spool_path:
+                continue
+            try:
+                f = open(path, encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            with f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # its process is still running
+                try:
+                    if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                        continue
+                except FileNotFoundError:
+                    continue  # adopted by another process while we waited
+                entries = self._read_spool(f)
+                # copy before deleting, so a crash in between only replays twice
+                self._append(*({"op": "write", **entry} for entry in entries))
+                os.remove(path)
+            for entry in entries:
+                pending[entry["id"]] = entry
+        return list(pending.values())
+
+    @staticmethod
+    def _read_spool(f):
+        """Writes in a spool that were never marked done."""
+        pending = {}
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json_util.loads(line)
+            except ValueError:
+                continue  # torn last line from a crash
+            if record["op"] == "write":
+                pending[record["id"]] = {k: record[k] for k in ("id", "collection", "doc")}
+            else:
+                pending.pop(record["id"], None)
+        return list(pending.values())
+
+
+@st.cache_resource
+def get_writer():
+    db = get_db()
+    # one submission and one latest version per (email, qid), even across processes
+    for collection in (RESPONSES, LATEST):
+        try:
+            db[collection].create_index([("email", 1), ("qid", 1)], unique=True)
+        except OperationFailure as e:
+            if e.code != 11000:  # duplicate key
+                raise
+            raise RuntimeError(
+                f"{collection} has duplicate (email, qid) documents; run migrate_responses.py first"
+            ) from e
+    # pages read completion from responses_latest, which only migrate_responses.py
+    # fills for submissions made before it existed
+    if db[RESPONSES].find_one({}, {"_id": 1}) and not db[LATEST].find_one({}, {"_id": 1}):
+        raise RuntimeError(f"{LATEST} is empty but {RESPONSES} is not; run migrate_responses.py first")
+    return SubmissionWriter(db)